@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Microbenchmark de group_lines/detect_columns: loop en Python vs numpy.
+# Corre sobre los PDFs de pdfs/ (tokens de pdfplumber) y sobre hojas sintéticas.
+#
+# Uso (desde la raíz del repo):
+#   python bench/bench_layout.py --tokens 10000 --repeat 5
+#
+import argparse, glob, os, random, sys, timeit
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import process_pdfs as pp
+
+@contextmanager
+def sin_numpy():
+    """Fuerza el camino en Python puro (como sin numpy instalado). numpy se usa
+    en process_pdfs y en extractores (TokenTable.sort_order): se apaga en los dos."""
+    saved = pp.np, pp.extractores.np
+    pp.np = pp.extractores.np = None
+    try:
+        yield
+    finally:
+        pp.np, pp.extractores.np = saved
+
+def synthetic_table(n_tokens, seed=1):
+    """Planilla de carrera sintética: filas de ~10 tokens con jitter vertical."""
+    rnd = random.Random(seed)
+    t = pp.TokenTable()
+    row = 0
+    while len(t) < n_tokens:
+        page, y = divmod(row, 60)
+        y = 90 + y * 12.0
+        x = 20.0
+        for word in ("01", "46", "DUPONT", "Braian", "1:31", ".", "687", "0", "1:31.687", "6"):
+            t.append(page, x + rnd.uniform(-1, 1), y + rnd.uniform(-1.5, 1.5), len(word) * 5.0, 9.0, word)
+            x += len(word) * 5.0 + rnd.choice((3.0, 18.0))
+        row += 1
+    # el orden de extracción no viene ordenado por (page, y, x)
+    order = list(range(len(t)))
+    rnd.shuffle(order)
+    return t.take(order)
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+def bench(label, table, repeat, y_tol=6.0):
+    with sin_numpy():
+        loop_lines = pp.group_lines(table, y_tol)
+        t_loop = best_ms(lambda: pp.group_lines(table, y_tol), repeat)
+        c_loop = best_ms(lambda: pp.detect_columns(loop_lines), repeat)
+        cols_loop = pp.detect_columns(loop_lines)
+    if not pp.np:
+        print(f"{label:<32} {len(table):>7} tok  loop {t_loop:8.2f} ms  cols {c_loop:7.2f} ms  (numpy no instalado)")
+        return
+    np_lines = pp.group_lines_np(table, y_tol)
+    t_np = best_ms(lambda: pp.group_lines_np(table, y_tol), repeat)
+    c_np = best_ms(lambda: pp.detect_columns(np_lines), repeat)
+    same = ([(p, y, [t.i for t in ts]) for p, y, ts in loop_lines] ==
+            [(p, y, [t.i for t in ts]) for p, y, ts in np_lines]) and cols_loop == pp.detect_columns(np_lines)
+    print(f"{label:<32} {len(table):>7} tok  loop {t_loop:8.2f} ms  numpy {t_np:8.2f} ms  "
+          f"cols {c_loop:7.2f}/{c_np:7.2f} ms  x{t_loop / t_np if t_np else 0:5.1f}  {'OK' if same else 'DIFIERE'}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Compara el layout en loop vs numpy")
+    ap.add_argument("--pdf-dir", default=pp.PDF_DIR)
+    ap.add_argument("--tokens", type=int, default=10000, help="Tamaño de la hoja sintética")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    for pdf in sorted(glob.glob(os.path.join(args.pdf_dir, "**", "*.[pP][dD][fF]"), recursive=True)):
+        toks, _ = pp.tokens_pdfplumber(pdf)
+        if len(toks):
+            bench(os.path.relpath(pdf, args.pdf_dir)[:32], toks, args.repeat)
+    for n in sorted({1000, args.tokens}):
+        bench(f"sintético {n}", synthetic_table(n), args.repeat)
+
+if __name__ == "__main__":
+    main()
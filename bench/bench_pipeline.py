@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Benchmark del pipeline completo: extracción (por backend), agrupación en filas,
+# parseo de campos y escritura del JSON. Corre sobre los PDFs de pdfs/ y sobre
+# planillas sintéticas, y guarda el resultado en bench/results/ para comparar
+# entre commits. No usa red; el OCR se saltea si no está tesseract.
+#
+# Uso (desde la raíz del repo):
+#   python bench/bench_pipeline.py                      # pdfs/ + sintéticos
+#   python bench/bench_pipeline.py --rows 400 --sheets 5 --no-ocr
+#   python bench/bench_pipeline.py --compare bench/results/<anterior>.json
+#
+import argparse, glob, json, os, platform, shutil, subprocess, sys, tempfile, time, tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import process_pdfs as pp
+
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+Y_TOL = 6.0  # el mismo que usa process_pdf
+
+def ocr_available():
+    if not (pp.convert_from_path and pp.pytesseract):
+        return False
+    try:
+        pp.pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def git_rev():
+    r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    rev = r.stdout.strip() or "sin-git"
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                           cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return rev + ("-dirty" if dirty else "")
+
+# --- planillas sintéticas ---
+NAMES = ["BURGOS Sebastian", "BALDUCHI Valentin", "CAPUTO Nicolas", "OYOLA Matias",
+         "ALZA Pablo", "DAILOFF Nehuen", "JACOB Ruben", "DUPONT Braian"]
+
+def synthetic_rows(n_rows, seed=0):
+    """Filas como las de una planilla real: pos, nro, nombre, rec, tiempo, vueltas."""
+    rows = []
+    base = 80.0 + seed
+    for k in range(n_rows):
+        t = base + k * 0.731
+        m, s = divmod(t, 60)
+        rows.append([f"{k + 1:02d}", str(10 + (k * 7) % 190), NAMES[k % len(NAMES)],
+                     "0", f"{int(m)}:{s:06.3f}", str(5 - (k % 97 == 96))])
+    return rows
+
+def synthetic_pdf(path, n_rows, seed=0, rows_per_page=60):
+    """Escribe una planilla sintética con PyMuPDF (texto real, sin OCR)."""
+    doc = pp.fitz.open()
+    rows = synthetic_rows(n_rows, seed)
+    xs = (30, 60, 100, 300, 340, 420)
+    for start in range(0, len(rows), rows_per_page):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((30, 40), "Fecha: 12/04/2025   Hora: 15:30", fontsize=9)
+        for j, row in enumerate(rows[start:start + rows_per_page]):
+            for x, text in zip(xs, row):
+                page.insert_text((x, 70 + j * 12.5), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def synthetic_table(n_rows, seed=0):
+    """Misma planilla pero directo como TokenTable (cuando no hay PyMuPDF)."""
+    t = pp.TokenTable()
+    for k, row in enumerate(synthetic_rows(n_rows, seed)):
+        page, j = divmod(k, 60)
+        x = 30.0
+        for text in " ".join(row).split():
+            t.append(page, x, 70 + j * 12.5, len(text) * 5.0, 9.0, text)
+            x += len(text) * 5.0 + 8.0
+    return t
+
+# --- medición ---
+def timed(fn, *args, repeat=1):
+    """(resultado, mejor tiempo en ms) sobre `repeat` corridas."""
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        dt = (time.perf_counter() - t0) * 1000
+        best = dt if best is None else min(best, dt)
+    return out, round(best, 3)
+
+def bench_tokens(label, toks, tmp_dir, repeat, stages):
+    lines, stages["group_lines"] = timed(pp.group_lines, toks, Y_TOL, repeat=repeat)
+    results, stages["parse"] = timed(pp.parse_lines_to_results, lines, repeat=repeat)
+    fecha, hora = pp.extract_meta(toks)
+    data = {"date": fecha, "time": hora, "results": results}
+    out = os.path.join(tmp_dir, label.replace(os.sep, "_") + ".json")
+
+    def write():
+        if os.path.exists(out):
+            os.remove(out)  # si no, write_bytes_atomic ve el archivo igual y no escribe
+        return pp.write_bytes_atomic(out, pp.dump_json_bytes(data))
+    _, stages["json_write"] = timed(write, repeat=repeat)
+    return len(results)
+
+def bench_pdf(pdf, label, tmp_dir, repeat, use_ocr):
+    stages, counts = {}, {}
+    backends = [("extract_pdfplumber", pp.tokens_pdfplumber)]
+    if pp.fitz:
+        backends.append(("extract_pymupdf", pp.tokens_pymupdf))
+    if use_ocr:
+        backends.append(("extract_ocr", pp.tokens_ocr))
+    for name, fn in backends:
+        (toks, _), stages[name] = timed(fn, pdf, repeat=1 if name == "extract_ocr" else repeat)
+        counts[name[len("extract_"):]] = len(toks)
+    (toks, extractor), stages["get_tokens"] = timed(pp.get_tokens, pdf, repeat=repeat)
+    rows = bench_tokens(label, toks, tmp_dir, repeat, stages)
+    return {"name": label, "kind": "pdf", "extractor": extractor, "tokens": len(toks),
+            "tokens_by_backend": counts, "rows": rows, "stages_ms": stages}
+
+def end_to_end(pdf, tmp_dir):
+    """Lo que hace process_pdf sin caché ni _debug: extraer, agrupar, parsear, escribir."""
+    toks, _ = pp.get_tokens(pdf)
+    lines = pp.group_lines(toks, y_tol=Y_TOL) if toks else []
+    data = {"date": None, "time": None, "results": pp.parse_lines_to_results(lines)}
+    pp.write_bytes_atomic(os.path.join(tmp_dir, os.path.basename(pdf) + ".json"), pp.dump_json_bytes(data))
+
+def throughput(pdfs, tmp_dir):
+    if not pdfs:
+        return {}
+    t0, c0 = time.perf_counter(), time.process_time()
+    for pdf in pdfs:
+        end_to_end(pdf, tmp_dir)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    tracemalloc.start()
+    for pdf in pdfs:
+        end_to_end(pdf, tmp_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"pdfs": len(pdfs), "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+            "pdfs_per_s": round(len(pdfs) / wall, 3) if wall else None,
+            "peak_mem_mb": round(peak / 2**20, 2)}
+
+def compare(prev_path, report):
+    """Imprime la diferencia por etapa contra un reporte anterior."""
+    prev = json.load(open(prev_path, encoding="utf-8"))
+    old = {c["name"]: c for c in prev.get("cases", [])}
+    print(f"\nComparación contra {os.path.basename(prev_path)} ({prev.get('commit')}):")
+    for case in report["cases"]:
+        before = old.get(case["name"])
+        if not before:
+            continue
+        for stage, ms in case["stages_ms"].items():
+            b = before["stages_ms"].get(stage)
+            if not b:
+                continue
+            pct = (ms - b) / b * 100
+            mark = "  <-- más lento" if pct > 10 else ""
+            print(f"  {case['name'][:30]:<30} {stage:<20} {b:9.2f} -> {ms:9.2f} ms  {pct:+6.1f}%{mark}")
+    a, b = prev.get("throughput", {}).get("pdfs_per_s"), report["throughput"].get("pdfs_per_s")
+    if a and b:
+        print(f"  throughput: {a} -> {b} PDFs/s ({(b - a) / a * 100:+.1f}%)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de extracción y parseo")
+    ap.add_argument("--pdf-dir", default=pp.PDF_DIR)
+    ap.add_argument("--rows", type=int, default=200, help="Filas por planilla sintética")
+    ap.add_argument("--sheets", type=int, default=3, help="Cantidad de planillas sintéticas (0 = ninguna)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-ocr", action="store_true", help="No medir el backend de OCR")
+    ap.add_argument("--out", help="Archivo JSON de salida (por defecto bench/results/<fecha>-<commit>.json)")
+    ap.add_argument("--compare", help="Reporte anterior contra el cual comparar")
+    args = ap.parse_args()
+
+    use_ocr = not args.no_ocr and ocr_available()
+    if not args.no_ocr and not use_ocr:
+        print("tesseract no disponible: se omite el backend de OCR")
+
+    pdf_dir = os.path.join(ROOT, args.pdf_dir) if not os.path.isabs(args.pdf_dir) else args.pdf_dir
+    pdfs = sorted(glob.glob(os.path.join(pdf_dir, "**", "*.[pP][dD][fF]"), recursive=True))
+    tmp_dir = tempfile.mkdtemp(prefix="bench_tiempos_")
+    cases = []
+    try:
+        for pdf in pdfs:
+            cases.append(bench_pdf(pdf, os.path.relpath(pdf, pdf_dir), tmp_dir, args.repeat, use_ocr))
+        synthetic = []
+        for k in range(args.sheets):
+            label = f"sintético {args.rows}x{k + 1}"
+            if pp.fitz:
+                path = os.path.join(tmp_dir, f"sintetico_{k + 1}.pdf")
+                synthetic_pdf(path, args.rows, seed=k)
+                synthetic.append(path)
+                case = bench_pdf(path, label, tmp_dir, args.repeat, use_ocr=False)
+            else:
+                stages = {}
+                toks = synthetic_table(args.rows, seed=k)
+                rows = bench_tokens(label, toks, tmp_dir, args.repeat, stages)
+                case = {"name": label, "kind": "tokens", "tokens": len(toks), "rows": rows, "stages_ms": stages}
+            case["kind"] = "synthetic-" + case["kind"]
+            cases.append(case)
+        report = {
+            "commit": git_rev(),
+            "created_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "backends": {"pdfplumber": True, "pymupdf": bool(pp.fitz), "ocr": use_ocr, "numpy": bool(pp.np)},
+            "params": {"rows": args.rows, "sheets": args.sheets, "repeat": args.repeat},
+            "cases": cases,
+            "throughput": throughput(pdfs + synthetic, tmp_dir),
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for c in cases:
+        st = "  ".join(f"{k}={v:.1f}" for k, v in c["stages_ms"].items())
+        print(f"{c['name'][:30]:<30} {c['tokens']:>6} tok {c['rows']:>5} filas  {st}")
+    tp = report["throughput"]
+    if tp:
+        print(f"Throughput: {tp['pdfs_per_s']} PDFs/s ({tp['pdfs']} PDFs, {tp['wall_s']} s), "
+              f"pico de memoria {tp['peak_mem_mb']} MB")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['created_utc'][:19].replace(':', '')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Reporte guardado en {out}")
+    if args.compare:
+        compare(args.compare, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# coding: utf-8
+# Posiciones del campeonato calculadas desde resultados/ (provisorias hasta que
+# llegue la planilla oficial de posiciones).
+#
+# Los puntos salen de pilotos.json (que process_pdfs mantiene al día de forma
+# incremental), así que recalcular después de cada carrera cuesta milisegundos.
+# Las columnas son las mismas que arma parse_posiciones.py (parse_row):
+# anterior, serie, semif, prefinal, final, total.
+#
+# Uso (desde la raíz del repo):
+#   python campeonato.py                          # escribe resultados/.../posiciones.json
+#   python campeonato.py --puntos puntos.json     # con otra tabla de puntos
+#   python campeonato.py --check pdfs/Posiciones/FECHA10.pdf --fecha "FECHA 10"
+#
+import argparse, hashlib, json, os, re, sys
+
+import process_pdfs as pp
+
+STANDINGS_FILE = "posiciones.json"   # resultados/<Fecha N>/posiciones.json y resultados/posiciones.json
+CHECK_FILE = "campeonato_check.json" # resultados/_debug/campeonato_check.json
+PUNTOS_FILE = os.environ.get("TIEMPOS_PUNTOS", "puntos.json")
+
+# Puntos por posición (1º, 2º, ...) para cada tipo de carrera; más allá de la
+# lista, 0. Sacados de la planilla oficial de la fecha 1; si el reglamento cambia,
+# pisalos con un puntos.json con la misma forma.
+DEFAULT_POINTS = {
+    "serie": [3, 2.75, 2.5, 2.25, 2, 1.5, 1],
+    "repechaje": [],
+    "semifinal": [8, 6, 4.5, 3.5, 3, 2.75, 2.5, 2, 1.5, 1, 0.75, 0.5, 0.25],
+    "prefinal": [8, 6, 4.5, 3.5, 3, 2.75, 2.5, 2, 1.5, 1, 0.75, 0.5, 0.25],
+    "final": [16, 12, 10, 8, 7, 6, 5, 4, 3],
+}
+# tipo de carrera -> columna de la planilla de posiciones
+COLUMN_OF = {"serie": "serie", "repechaje": "serie", "semifinal": "semif", "prefinal": "prefinal", "final": "final"}
+COLUMNS = ("serie", "semif", "prefinal", "final")
+RE_RACE_KIND = re.compile(r"^([a-z]+)")
+
+def load_points(path=None):
+    """Tabla de puntos: la de path (o puntos.json si existe) sobre DEFAULT_POINTS."""
+    table = {k: list(v) for k, v in DEFAULT_POINTS.items()}
+    path = path or PUNTOS_FILE
+    if path and os.path.exists(path):
+        custom = pp.load_json(path, None)
+        if not isinstance(custom, dict):
+            raise ValueError(f"{path}: se esperaba un objeto {{tipo_de_carrera: [puntos...]}}")
+        unknown = set(custom) - set(COLUMN_OF)
+        if unknown:
+            raise ValueError(f"{path}: tipos de carrera desconocidos: {sorted(unknown)}")
+        table.update({k: [float(p) for p in v] for k, v in custom.items()})
+    return table
+
+def points_for(table, race, position):
+    kind = RE_RACE_KIND.match(race)
+    pts = table.get(kind.group(1), []) if kind else []
+    if not position or position < 1 or position > len(pts):
+        return 0.0
+    return float(pts[position - 1])
+
+def _round(x):
+    return round(x, 2)
+
+def compute_standings(drivers, fechas, table):
+    """drivers: el dict "pilotos" de pilotos.json. Devuelve {fecha: [filas]} con
+    las filas en el formato de parse_row, ordenadas por total."""
+    by_fecha = {f: {} for f in fechas}
+    info = {}
+    for key, d in drivers.items():
+        info[key] = d
+        for e in d.get("resultados", []):
+            if e["fecha"] not in by_fecha:
+                continue
+            col = COLUMN_OF.get(RE_RACE_KIND.match(e["race"]).group(1)) if RE_RACE_KIND.match(e["race"]) else None
+            if not col:
+                continue
+            row = by_fecha[e["fecha"]].setdefault(key, dict.fromkeys(COLUMNS, 0.0))
+            row[col] += points_for(table, e["race"], e.get("position"))
+            row.setdefault("nro", e.get("number"))
+
+    out, totals = {}, {}
+    for fecha in fechas:
+        rows = []
+        for key in sorted(set(totals) | set(by_fecha[fecha])):
+            pts = by_fecha[fecha].get(key, dict.fromkeys(COLUMNS, 0.0))
+            anterior = totals.get(key, 0.0)
+            total = anterior + sum(pts[c] for c in COLUMNS)
+            totals[key] = total
+            d = info[key]
+            rows.append({"pos": None, "nro": pts.get("nro", (d.get("numbers") or [None])[-1]),
+                         "nombre": d.get("name"), "anterior": _round(anterior),
+                         **{c: _round(pts[c]) for c in COLUMNS},
+                         "total": _round(total), "fin": None, "extras_raw": None})
+        # desempate: más puntos en la final de la fecha, después nombre
+        rows.sort(key=lambda r: (-r["total"], -r["final"], r["nombre"] or ""))
+        for i, r in enumerate(rows, 1):
+            r["pos"] = i
+        out[fecha] = rows
+    return out
+
+def _table_digest(table):
+    return hashlib.sha256(json.dumps(table, sort_keys=True).encode()).hexdigest()[:12]
+
+def build_standings(writer, force=False, table=None):
+    """Escribe resultados/<Fecha N>/posiciones.json (una por fecha) y
+    resultados/posiciones.json (la última). Se recalcula sólo si en esta corrida
+    cambió pilotos.json, cambió la tabla de puntos o falta la salida."""
+    table = table or load_points()
+    digest = _table_digest(table)
+    drivers_path = os.path.join(pp.OUTPUT_DIR, pp.DRIVERS_INDEX)
+    latest_path = os.path.join(pp.OUTPUT_DIR, STANDINGS_FILE)
+    changed = {os.path.abspath(p) for p in writer.changed}
+    stored = pp.load_json(latest_path, {}).get("meta", {}).get("puntos")
+    if not (force or os.path.abspath(drivers_path) in changed or stored != digest):
+        return None
+
+    fechas = pp.load_json(os.path.join(pp.OUTPUT_DIR, "fechas.json"), {"fechas": []}).get("fechas", [])
+    drivers = pp.load_json(drivers_path, {}).get("pilotos", {})
+    standings = compute_standings(drivers, fechas, table)
+    for n, fecha in enumerate(fechas, 1):
+        data = {"meta": {"source": "resultados", "provisional": True, "fecha": fecha,
+                         "fechas_cumplidas": n, "puntos": digest},
+                "standings": standings[fecha]}
+        writer.write_json(os.path.join(pp.OUTPUT_DIR, fecha, STANDINGS_FILE), data)
+        if n == len(fechas):
+            writer.write_json(latest_path, data)
+    return standings
+
+# === Control contra la planilla oficial ===
+def load_official(path):
+    """posiciones.json ya parseado o el PDF (vía pdfs/Posiciones/parse_posiciones.py)."""
+    if path.lower().endswith(".json"):
+        return pp.load_json(path, {}).get("standings", [])
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("parse_posiciones", pp.STANDINGS_SCRIPT)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    data, _ = mod.parse_pdf(path)
+    return data["standings"]
+
+def cross_check(computed, official, tol=0.01):
+    """Compara por número de auto (y nombre normalizado si el número no
+    alcanza, por nombre). Devuelve las diferencias: columnas que no coinciden y pilotos que
+    están de un solo lado."""
+    def key(r):
+        return (r.get("nro"), pp.normalize_name(r.get("nombre")))
+    mine = {key(r): r for r in computed}
+    by_nro, by_name = {}, {}
+    for k in mine:
+        by_nro.setdefault(k[0], []).append(k)
+        by_name.setdefault(k[1], []).append(k)
+    diffs, seen = [], set()
+    for r in official:
+        k = key(r)
+        if k not in mine and len(by_nro.get(k[0], [])) == 1:
+            k = by_nro[k[0]][0]   # mismo auto, nombre escrito distinto
+        elif k not in mine and len(by_name.get(k[1], [])) == 1:
+            k = by_name[k[1]][0]  # mismo piloto, cambió de número
+        c = mine.get(k)
+        if c is None:
+            diffs.append({"nro": r.get("nro"), "nombre": r.get("nombre"), "falta": "calculado"})
+            continue
+        seen.add(k)
+        cols = {col: {"oficial": r.get(col), "calculado": c.get(col)}
+                for col in ("pos", "anterior") + COLUMNS + ("total",)
+                if r.get(col) is not None and abs((c.get(col) or 0) - r[col]) > tol}
+        if cols:
+            diffs.append({"nro": r.get("nro"), "nombre": r.get("nombre"), "columnas": cols})
+    for k, c in mine.items():
+        if k not in seen and c["total"]:
+            diffs.append({"nro": c["nro"], "nombre": c["nombre"], "falta": "oficial"})
+    return diffs
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Posiciones del campeonato calculadas desde resultados/")
+    ap.add_argument("--puntos", default=None, help=f"Tabla de puntos JSON (default: {PUNTOS_FILE} si existe)")
+    ap.add_argument("--check", metavar="PDF_O_JSON", default=None,
+                    help="Comparar contra la planilla oficial (PDF o posiciones.json parseado)")
+    ap.add_argument("--fecha", default=None, help="(--check) fecha a comparar (default: la última)")
+    args = ap.parse_args(argv)
+
+    table = load_points(args.puntos)
+    writer = pp.OutputWriter()
+    standings = build_standings(writer, force=True, table=table)   # son milisegundos
+    print(f"[CAMPEONATO] resultados/: {writer.summary()}")
+    if not args.check:
+        return 0
+    if not standings:
+        print("[CAMPEONATO] No hay fechas en resultados/ para comparar.", file=sys.stderr)
+        return 1
+    fecha = args.fecha or list(standings)[-1]
+    if fecha not in standings:
+        print(f"[CAMPEONATO] No existe la fecha {fecha!r} en resultados/.", file=sys.stderr)
+        return 2
+    diffs = cross_check(standings[fecha], load_official(args.check))
+    writer.write_json(os.path.join(pp.DEBUG_DIR, CHECK_FILE),
+                      {"fecha": fecha, "oficial": os.path.basename(args.check), "diferencias": diffs})
+    if diffs:
+        print(f"[CAMPEONATO] {fecha}: {len(diffs)} diferencias con {os.path.basename(args.check)} "
+              f"(detalle en {os.path.join(pp.DEBUG_DIR, CHECK_FILE)})")
+        for d in diffs[:10]:
+            print(f"  #{d['nro']} {d['nombre']}: " +
+                  (f"falta en {d['falta']}" if "falta" in d else
+                   ", ".join(f"{c} {v['calculado']} vs {v['oficial']}" for c, v in d["columnas"].items())))
+        return 1
+    print(f"[CAMPEONATO] {fecha}: coincide con {os.path.basename(args.check)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# coding: utf-8
+# Detección de cambios en pdfs/ con un diario persistente (.diario_pdfs.json):
+# por cada PDF se guarda tamaño, mtime, sha256 y el JSON de resultados/ que
+# generó. Comparando contra el diario sale qué PDFs son nuevos, cuáles cambiaron,
+# cuáles se borraron y cuáles sólo se renombraron o movieron, sin abrir ni
+# hashear los que no se tocaron (tamaño y mtime iguales).
+#
+# Este módulo no sabe nada de extracción: process_pdfs decide qué hacer con cada
+# cambio y le avisa al diario qué salida quedó para cada PDF.
+import os, json, hashlib
+from dataclasses import dataclass, field
+
+JOURNAL_FILE = "./.diario_pdfs.json"
+JOURNAL_VERSION = 1
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def iter_pdf_files(pdf_dir):
+    """(fecha_dir, pdf_file, pdf_path, stat) de cada pdfs/<Fecha N>/*.pdf, en
+    orden determinístico. scandir trae el stat sin otra llamada en Windows.
+    Si pdf_dir no existe, FileNotFoundError: una carpeta desmontada o movida no
+    es lo mismo que una carpeta vacía (no hay que borrar todo lo generado)."""
+    fechas = sorted((e for e in os.scandir(pdf_dir) if e.is_dir() and e.name.lower().startswith("fecha")),
+                    key=lambda e: e.name)
+    for fecha in fechas:
+        files = sorted((e for e in os.scandir(fecha.path) if e.name.lower().endswith(".pdf") and e.is_file()),
+                       key=lambda e: e.name)
+        for e in files:
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            yield fecha.name, e.name, os.path.join(pdf_dir, fecha.name, e.name), st
+
+def journal_key(fecha_dir, pdf_file):
+    return f"{fecha_dir}/{pdf_file}"
+
+@dataclass
+class ScanDiff:
+    """Resultado de comparar pdfs/ contra el diario. Cada PDF va como
+    (fecha_dir, pdf_file, pdf_path); renamed son pares (clave_vieja, PDF nuevo)."""
+    added: list = field(default_factory=list)
+    modified: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)     # claves del diario
+    renamed: list = field(default_factory=list)
+    unchanged: int = 0
+    hashed: int = 0
+    stats: dict = field(default_factory=dict)       # pdf_path -> (size, mtime_ns, sha256)
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.deleted or self.renamed)
+
+    def summary(self):
+        return (f"{len(self.added)} nuevos, {len(self.modified)} modificados, {len(self.deleted)} borrados, "
+                f"{len(self.renamed)} renombrados, {self.unchanged} sin cambios ({self.hashed} hasheados)")
+
+class Journal:
+    """El diario: {clave "Fecha N/ARCHIVO.PDF": {size, mtime_ns, sha256, output}}
+    donde output es la ruta (relativa a resultados/) del JSON que generó, o None
+    si el PDF no dio filas. settings resume lo que cambia la salida (versión del
+    parser, extractores, --columnar): si no coincide, todo cuenta como modificado."""
+
+    def __init__(self, path=JOURNAL_FILE, settings=""):
+        self.path = path
+        self.settings = settings
+        self.entries = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=JOURNAL_FILE, settings=""):
+        journal = cls(path, settings)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return journal
+        if data.get("version") == JOURNAL_VERSION and data.get("settings") == settings:
+            journal.entries = data.get("files", {})
+        else:
+            journal.dirty = True  # otra configuración: se reprocesa todo
+        return journal
+
+    def save(self):
+        if not self.dirty:
+            return False
+        payload = json.dumps({"version": JOURNAL_VERSION, "settings": self.settings,
+                              "files": dict(sorted(self.entries.items()))},
+                             ensure_ascii=False, indent=1).encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+        self.dirty = False
+        return True
+
+    def record(self, key, size, mtime_ns, sha256, output):
+        new = {"size": size, "mtime_ns": mtime_ns, "sha256": sha256, "output": output}
+        if self.entries.get(key) != new:
+            self.entries[key] = new
+            self.dirty = True
+
+    def drop(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def outputs(self):
+        """{output: [claves]} de las entradas que generaron un JSON."""
+        out = {}
+        for key, e in self.entries.items():
+            if e.get("output"):
+                out.setdefault(e["output"], []).append(key)
+        return out
+
+    def scan(self, pdf_dir, output_dir=None):
+        """Compara pdfs/ contra el diario. Sólo se hashea un PDF si su tamaño o
+        mtime no coinciden con los del diario. Con output_dir, un PDF sin cambios
+        cuyo JSON ya no está en resultados/ cuenta como modificado."""
+        diff = ScanDiff()
+        seen, fresh = set(), []
+        for fecha_dir, pdf_file, pdf_path, st in iter_pdf_files(pdf_dir):
+            key = journal_key(fecha_dir, pdf_file)
+            seen.add(key)
+            job = (fecha_dir, pdf_file, pdf_path)
+            e = self.entries.get(key)
+            if e and e["size"] == st.st_size and e["mtime_ns"] == st.st_mtime_ns:
+                diff.stats[pdf_path] = (st.st_size, st.st_mtime_ns, e["sha256"])
+                missing = output_dir and e.get("output") and not os.path.exists(os.path.join(output_dir, e["output"]))
+                if missing:
+                    diff.modified.append(job)
+                else:
+                    diff.unchanged += 1
+                continue
+            try:
+                sha = file_sha256(pdf_path)
+            except OSError:
+                continue  # se borró mientras escaneábamos
+            diff.hashed += 1
+            diff.stats[pdf_path] = (st.st_size, st.st_mtime_ns, sha)
+            if e is None:
+                fresh.append((job, sha))
+            elif e["sha256"] == sha:
+                # tocado pero igual (copiado encima, cambió el mtime): sólo actualizar el diario
+                self.record(key, st.st_size, st.st_mtime_ns, sha, e.get("output"))
+                diff.unchanged += 1
+            else:
+                diff.modified.append(job)
+
+        gone = {key: e for key, e in self.entries.items() if key not in seen}
+        by_hash = {}
+        for key, e in gone.items():
+            by_hash.setdefault(e["sha256"], []).append(key)
+        for job, sha in fresh:
+            old = by_hash.get(sha)
+            if old:
+                diff.renamed.append((old.pop(0), job))
+            else:
+                diff.added.append(job)
+        renamed_from = {old for old, _ in diff.renamed}
+        diff.deleted = sorted(key for key in gone if key not in renamed_from)
+        return diff
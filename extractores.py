@@ -0,0 +1,614 @@
+# coding: utf-8
+# Extracción de tokens con coordenadas desde los PDFs: pdfplumber, PyMuPDF y OCR
+# (tesseract). Los backends se importan recién la primera vez que se usan, así que
+# importar este módulo (o process_pdfs) no carga ninguna librería de PDF.
+import os, io, re, sys, mmap, time, hashlib, importlib, importlib.util, threading
+from array import array
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from itertools import repeat
+
+class LazyImport:
+    """Módulo (o atributo de un módulo) que recién se importa la primera vez que
+    se usa: importar extractores (o process_pdfs) no carga pdfplumber, PyMuPDF, numpy ni
+    tesseract. Es falso si no está instalado, así que `if fitz:` sigue sirviendo."""
+    _UNSET = object()
+
+    def __init__(self, names, attr=None, on_load=None, before_load=None):
+        self._names = (names,) if isinstance(names, str) else tuple(names)
+        self._attr = attr
+        self._on_load = on_load
+        self._before_load = before_load
+        self._obj = self._UNSET
+
+    def _load(self):
+        if self._obj is self._UNSET:
+            if self._before_load:
+                self._before_load()
+            obj = None
+            for name in self._names:
+                try:
+                    obj = importlib.import_module(name)
+                    break
+                except Exception:
+                    continue
+            if obj is not None and self._attr:
+                obj = getattr(obj, self._attr, None)
+            if obj is not None and self._on_load:
+                self._on_load(obj)
+            self._obj = obj
+        return self._obj
+
+    def __bool__(self):
+        return self._load() is not None
+
+    def __getattr__(self, name):
+        obj = self._load()
+        if obj is None:
+            raise ImportError(f"{self._names[0]} no está instalado")
+        return getattr(obj, name)
+
+    def __call__(self, *args, **kwargs):
+        obj = self._load()
+        if obj is None:
+            raise ImportError(f"{self._names[0]} no está instalado")
+        return obj(*args, **kwargs)
+
+def _setup_pytesseract(mod):
+    if TESSERACT_CMD:
+        mod.pytesseract.tesseract_cmd = TESSERACT_CMD
+    # sólo en el entorno de los tesseract que lanza (ver OCR_OMP_THREADS)
+    mod.pytesseract.environ = ChainMap(os.environ, {"OMP_THREAD_LIMIT": OCR_OMP_THREADS})
+
+def _limit_omp_threads():
+    # tesserocr corre en este proceso y OpenMP lee la variable al cargar la
+    # librería: tiene que estar antes del import (ver OCR_OMP_THREADS)
+    if importlib.util.find_spec("tesserocr"):
+        os.environ.setdefault("OMP_THREAD_LIMIT", OCR_OMP_THREADS)
+
+pdfplumber = LazyImport("pdfplumber")
+np = LazyImport("numpy")
+fitz = LazyImport(("pymupdf", "fitz"))          # PyMuPDF
+Image = LazyImport("PIL.Image")                 # viene con pdfplumber; rasterizado para OCR vía PyMuPDF
+convert_from_path = LazyImport("pdf2image", "convert_from_path")
+convert_from_bytes = LazyImport("pdf2image", "convert_from_bytes")
+pytesseract = LazyImport("pytesseract", on_load=_setup_pytesseract)
+tesserocr = LazyImport("tesserocr", before_load=_limit_omp_threads)  # tesseract en proceso (sin lanzar un .exe por página)
+
+# ==== CONFIG ====
+# Opcional (Windows): seteá si tu sistema no los encuentra solo
+TESSERACT_CMD = None  # r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+POPPLER_PATH = None   # r"C:\poppler\Library\bin"
+
+OCR_DPI = 300
+OCR_WORKERS = int(os.environ.get("TIEMPOS_OCR_WORKERS") or min(4, os.cpu_count() or 1))
+# Hilos de OpenMP por tesseract (OMP_THREAD_LIMIT): las páginas ya van en paralelo
+# en OCR_WORKERS hilos, y con varios hilos por página se pisan. Con pytesseract
+# se pasa sólo a sus procesos; con tesserocr se pone en os.environ justo antes de
+# importarlo (es la única forma), y sólo si no estaba definida.
+OCR_OMP_THREADS = "1"
+# DPI adaptativo: primero OCR_LOW_DPI; re-OCR a OCR_DPI si la confianza media (0-100)
+# queda por debajo de OCR_MIN_CONF o salen menos de MIN_PAGE_TOKENS tokens.
+OCR_ADAPTIVE_DPI = os.environ.get("TIEMPOS_OCR_ADAPTIVE", "") not in ("", "0")
+OCR_LOW_DPI = 150
+OCR_MIN_CONF = 60.0
+MIN_TOKENS_THRESHOLD = 25  # si hay menos, intentamos siguiente extractor
+MIN_PAGE_TOKENS = 5        # página con menos tokens: probablemente escaneada, va sola al fallback
+# Probar PyMuPDF antes que pdfplumber (más rápido; las coordenadas pueden diferir un poco)
+PYMUPDF_FIRST = os.environ.get("TIEMPOS_PYMUPDF_FIRST", "") not in ("", "0")
+
+# Lo que las opciones de la CLI (--pymupdf-first, --ocr-adaptive, --ocr-workers)
+# cambian de la extracción: el cliente se lo manda al servidor de extracción con
+# cada pedido para que extraiga igual que si lo hiciera él.
+SETTINGS = ("PYMUPDF_FIRST", "OCR_ADAPTIVE_DPI", "OCR_WORKERS")
+
+def extraction_settings():
+    return {name: globals()[name] for name in SETTINGS}
+
+@contextmanager
+def using_settings(settings):
+    """Aplica settings (de extraction_settings()) mientras dura el bloque. No es
+    thread-safe: el servidor corre los trabajos de a uno."""
+    g = globals()
+    saved = extraction_settings()
+    g.update({k: v for k, v in (settings or {}).items() if k in SETTINGS})
+    try:
+        yield
+    finally:
+        g.update(saved)
+
+# === Utilidades de normalización ===
+RE_SPACES = re.compile(r"[ \t]+")
+
+def norm(s: str) -> str:
+    if s is None: return ""
+    s = s.replace("\u00A0", " ")
+    s = RE_SPACES.sub(" ", s)
+    return s.strip()
+
+# === Tabla de tokens (columnas en vez de un dict por palabra) ===
+class Token(tuple):
+    """Vista liviana (table, i) de una fila de TokenTable; se usa como el dict de
+    antes (t["text"], t["x"], ...). Escribir t["text"] modifica la tabla.
+    Es una tupla para que TokenTable.views() las cree sin pasar por Python."""
+    __slots__ = ()
+
+    @property
+    def table(self):
+        return tuple.__getitem__(self, 0)
+
+    @property
+    def i(self):
+        return tuple.__getitem__(self, 1)
+
+    def __getitem__(self, key):
+        table, i = self
+        return getattr(table, key)[i]
+
+    def __setitem__(self, key, value):
+        table, i = self
+        if key == "text":
+            value = sys.intern(value)
+        getattr(table, key)[i] = value
+
+    def get(self, key, default=None):
+        return self[key] if key in TokenTable.COLUMNS else default
+
+    def to_dict(self):
+        return {k: self[k] for k in TokenTable.COLUMNS}
+
+    def __repr__(self):
+        return f"Token({self.to_dict()!r})"
+
+class TokenTable:
+    """Tokens de un PDF guardados por columnas: page en array('i'), x/y/w/h en
+    array('d') y los textos internados en una lista. Indexar devuelve vistas
+    Token; las vistas comparten la tabla, no copian nada."""
+    COLUMNS = ("page", "x", "y", "w", "h", "text")
+    __slots__ = COLUMNS
+
+    def __init__(self):
+        self.page = array("i")
+        self.x = array("d"); self.y = array("d")
+        self.w = array("d"); self.h = array("d")
+        self.text = []
+
+    def append(self, page, x, y, w, h, text):
+        self.page.append(page)
+        self.x.append(x); self.y.append(y)
+        self.w.append(w); self.h.append(h)
+        self.text.append(sys.intern(text))
+
+    def extend(self, other):
+        for col in self.COLUMNS:
+            getattr(self, col).extend(getattr(other, col))
+
+    def __len__(self):
+        return len(self.text)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.views(range(*i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return Token((self, i))
+
+    def __iter__(self):
+        return iter(self.views(range(len(self))))
+
+    def views(self, indexes):
+        """[Token] para esos índices (sin copiar datos)."""
+        return list(map(Token, zip(repeat(self), indexes)))
+
+    def take(self, indexes):
+        out = TokenTable()
+        for col in self.COLUMNS:
+            src = getattr(self, col)
+            if col == "text":
+                out.text = [src[i] for i in indexes]
+            else:
+                getattr(out, col).extend(src[i] for i in indexes)
+        return out
+
+    def split_pages(self):
+        """{page: TokenTable} respetando el orden original dentro de cada página."""
+        idx = {}
+        for i, p in enumerate(self.page):
+            idx.setdefault(p, []).append(i)
+        return {p: self.take(ix) for p, ix in idx.items()}
+
+    def sort_order(self):
+        """Índices ordenados por (page, y, x)."""
+        n = len(self)
+        if np and n > 64:
+            return np.lexsort((np.frombuffer(self.x, dtype=np.float64),
+                               np.frombuffer(self.y, dtype=np.float64),
+                               np.frombuffer(self.page, dtype=np.int32))).tolist()
+        page, y, x = self.page, self.y, self.x
+        return sorted(range(n), key=lambda i: (page[i], y[i], x[i]))
+
+    def to_columns(self):
+        return {col: list(getattr(self, col)) for col in self.COLUMNS}
+
+    @classmethod
+    def from_columns(cls, cols):
+        out = cls()
+        for col in cls.COLUMNS:
+            if col == "text":
+                out.text = [sys.intern(t) for t in cols["text"]]
+            else:
+                getattr(out, col).extend(cols[col])
+        return out
+
+    @classmethod
+    def coerce(cls, tokens):
+        """Acepta una TokenTable o la lista de dicts del formato anterior."""
+        if isinstance(tokens, cls):
+            return tokens
+        out = cls()
+        for t in tokens:
+            out.append(t["page"], t["x"], t["y"], t["w"], t["h"], t["text"])
+        return out
+
+# === Telemetría por PDF ===
+def _cpu_seconds():
+    """CPU de este proceso más la de los hijos ya terminados (tesseract, pdftoppm).
+    En Windows os.times() no informa los hijos."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+@dataclass
+class Telemetry:
+    """Tiempos por etapa (pared y CPU, en ms), fallbacks que se dispararon y por
+    qué, y páginas (desde 1) que pasaron por OCR. Viaja dentro de PdfResult, así
+    que también vuelve de los procesos del pool."""
+    stages: dict = field(default_factory=dict)
+    fallbacks: list = field(default_factory=list)
+    ocr_pages: list = field(default_factory=list)
+    probe: dict = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name):
+        t0, c0 = time.perf_counter(), _cpu_seconds()
+        try:
+            yield
+        finally:
+            st = self.stages.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0})
+            st["wall_ms"] = round(st["wall_ms"] + (time.perf_counter() - t0) * 1000, 3)
+            st["cpu_ms"] = round(st["cpu_ms"] + (_cpu_seconds() - c0) * 1000, 3)
+
+    @property
+    def wall_ms(self):
+        return round(sum(st["wall_ms"] for st in self.stages.values()), 3)
+
+    def to_dict(self):
+        return {"wall_ms": self.wall_ms, **asdict(self)}
+
+# === Extracción de TOKENS con coordenadas ===
+# Cada extractor acepta pages=None (todas) o una lista de índices de página (0-based),
+# y como fuente una ruta, bytes, un archivo abierto o un PdfSource ya abierto (así el
+# PDF se lee una sola vez).
+def _page_indexes(n_pages, pages):
+    return range(n_pages) if pages is None else [p for p in pages if 0 <= p < n_pages]
+
+class PdfSource:
+    """Un PDF abierto una sola vez: los bytes quedan mapeados en memoria (mmap) y
+    de ahí leen el hash del caché, pdfplumber, PyMuPDF y la rasterización para
+    OCR. Cada backend abre su documento a lo sumo una vez y recién cuando se usa.
+
+    pdf puede ser una ruta, bytes (o bytearray/memoryview) o un archivo abierto
+    en modo binario; en esos dos últimos casos no se toca el disco y path es None."""
+
+    def __init__(self, pdf):
+        self.path, self._file = None, None
+        if isinstance(pdf, (bytes, bytearray, memoryview)):
+            self.data = pdf
+        elif hasattr(pdf, "read"):
+            self.data = pdf.read()
+        else:
+            self.path = os.fspath(pdf)
+            self._file = open(self.path, "rb")
+            try:
+                self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # archivo vacío: no se puede mapear
+                self.data = b""
+        self.lock = threading.Lock()  # PyMuPDF no es thread-safe (OCR en hilos)
+        self._plumber = None
+        self._fitz = None
+        self._view = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for doc in (self._plumber, self._fitz):
+            if doc is not None:
+                try:
+                    doc.close()
+                except Exception:
+                    pass
+        self._plumber = self._fitz = None
+        if self._view is not None:
+            self._view.release()  # si no, el mmap no se puede cerrar
+            self._view = None
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self._file:
+            self._file.close()
+
+    def sha256(self):
+        return hashlib.sha256(self.data).hexdigest()
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            stream = self.data if isinstance(self.data, mmap.mmap) else io.BytesIO(self.data)
+            self._plumber = pdfplumber.open(stream)
+        return self._plumber
+
+    @property
+    def fitz(self):
+        if self._fitz is None and fitz:
+            self._view = memoryview(self.data)
+            self._fitz = fitz.open(stream=self._view, filetype="pdf")
+        return self._fitz
+
+    @property
+    def page_count(self):
+        try:
+            if fitz:
+                return self.fitz.page_count
+        except Exception:
+            pass
+        try:
+            return len(self.plumber.pages)
+        except Exception:
+            return 0
+
+@contextmanager
+def open_source(pdf):
+    """PdfSource para una ruta, bytes o archivo (y lo cierra al salir) o el mismo
+    si ya lo es."""
+    if isinstance(pdf, PdfSource):
+        yield pdf
+    else:
+        with PdfSource(pdf) as src:
+            yield src
+
+def tokens_pdfplumber(pdf_path, pages=None):
+    toks = TokenTable()
+    try:
+        with open_source(pdf_path) as src:
+            pdf = src.plumber
+            for pidx in _page_indexes(len(pdf.pages), pages):
+                page = pdf.pages[pidx]
+                for w in page.extract_words(use_text_flow=True) or []:
+                    toks.append(pidx,
+                                float(w["x0"]), float(w["top"]),
+                                float(w["x1"] - w["x0"]), float(w["bottom"] - w["top"]),
+                                norm(w["text"]))
+                page.close()  # libera el caché de objetos de la página
+    except Exception:
+        pass
+    return toks, "pdfplumber"
+
+def tokens_pymupdf(pdf_path, pages=None):
+    if not fitz: return TokenTable(), "pymupdf"
+    toks = TokenTable()
+    try:
+        with open_source(pdf_path) as src:
+            doc = src.fitz
+            for pidx in _page_indexes(doc.page_count, pages):
+                for b in doc[pidx].get_text("words") or []:
+                    toks.append(pidx,
+                                float(b[0]), float(b[1]),
+                                float(b[2]-b[0]), float(b[3]-b[1]),
+                                norm(b[4]))
+    except Exception:
+        pass
+    return toks, "pymupdf"
+
+_tess = threading.local()
+
+def _tesserocr_api():
+    """Una instancia de tesseract por hilo, que queda cargada entre páginas y
+    archivos (con pytesseract cada página lanza un proceso y relee los modelos)."""
+    api = getattr(_tess, "api", None)
+    if api is None:
+        kwargs = {"psm": tesserocr.PSM.SINGLE_BLOCK, "oem": tesserocr.OEM.DEFAULT}
+        try:
+            api = tesserocr.PyTessBaseAPI(lang="spa+eng", **kwargs)
+        except RuntimeError:  # falta el idioma spa
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+        _tess.api = api
+    return api
+
+def ocr_image_tesserocr(img, pidx, scale=1.0):
+    api = _tesserocr_api()
+    api.SetImage(img)
+    api.Recognize()
+    level = tesserocr.RIL.WORD
+    toks, confs = TokenTable(), []
+    it = api.GetIterator()
+    for r in (tesserocr.iterate_level(it, level) if it is not None else ()):
+        txt = norm(r.GetUTF8Text(level))
+        box = r.BoundingBox(level)
+        if not txt or not box: continue
+        x0, y0, x1, y1 = box
+        toks.append(pidx, x0 * scale, y0 * scale, (x1 - x0) * scale, (y1 - y0) * scale, txt)
+        conf = r.Confidence(level)
+        if conf >= 0:
+            confs.append(conf)
+    return toks, (sum(confs) / len(confs) if confs else 0.0)
+
+def ocr_image(img, pidx, scale=1.0):
+    """OCR de una imagen -> (tokens, confianza media). scale lleva las coordenadas
+    a las de una imagen a OCR_DPI cuando se rasterizó a otro DPI. Con tesserocr
+    instalado el OCR corre en este proceso; si no (o si falla), pytesseract."""
+    if tesserocr:
+        try:
+            return ocr_image_tesserocr(img, pidx, scale)
+        except Exception:
+            pass
+    try:
+        data = pytesseract.image_to_data(img, lang="spa+eng", output_type=pytesseract.Output.DICT,
+                                         config="--psm 6 --oem 3")
+    except Exception:
+        data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT,
+                                         config="--psm 6 --oem 3")
+    toks, confs = TokenTable(), []
+    n = len(data["text"])
+    for i in range(n):
+        txt = norm(data["text"][i])
+        if not txt: continue
+        x = float(data["left"][i]) * scale; y = float(data["top"][i]) * scale
+        w = float(data["width"][i]) * scale; h = float(data["height"][i]) * scale
+        toks.append(pidx, x, y, w, h, txt)
+        try:
+            conf = float(data.get("conf", [])[i])
+        except (IndexError, TypeError, ValueError):
+            continue
+        if conf >= 0:
+            confs.append(conf)
+    return toks, (sum(confs) / len(confs) if confs else 0.0)
+
+def rasterize_page(src, pidx, dpi):
+    """Con PyMuPDF rasteriza desde el documento ya abierto (sin lanzar pdftoppm ni
+    releer el archivo); si no, pdf2image sobre la ruta."""
+    if fitz and Image:
+        with src.lock:
+            pix = src.fitz[pidx].get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    convert, pdf = (convert_from_path, src.path) if src.path else (convert_from_bytes, bytes(src.data))
+    images = convert(pdf, dpi=dpi, poppler_path=POPPLER_PATH, first_page=pidx + 1, last_page=pidx + 1)
+    return images[0] if images else None
+
+def ocr_page(src, pidx):
+    """OCR de una página. Con OCR_ADAPTIVE_DPI prueba primero a OCR_LOW_DPI y sólo
+    repite a OCR_DPI si salen pocos tokens o la confianza es baja."""
+    try:
+        if OCR_ADAPTIVE_DPI and OCR_LOW_DPI < OCR_DPI:
+            img = rasterize_page(src, pidx, OCR_LOW_DPI)
+            if img is not None:
+                toks, conf = ocr_image(img, pidx, scale=OCR_DPI / OCR_LOW_DPI)
+                del img
+                if len(toks) >= MIN_PAGE_TOKENS and conf >= OCR_MIN_CONF:
+                    return toks
+        img = rasterize_page(src, pidx, OCR_DPI)
+        return ocr_image(img, pidx)[0] if img is not None else TokenTable()
+    except Exception:
+        return TokenTable()
+
+def ocr_available():
+    return bool((tesserocr or pytesseract) and ((fitz and Image) or convert_from_path))
+
+def tokens_ocr(pdf_path, pages=None):
+    """Rasteriza de a una página y reparte las páginas en un pool de OCR_WORKERS
+    hilos (con pytesseract cada página es un proceso aparte; con tesserocr, una
+    instancia por hilo que se reutiliza). En memoria hay a lo sumo
+    OCR_WORKERS bitmaps a la vez."""
+    if not ocr_available(): return TokenTable(), "ocr"
+    with open_source(pdf_path) as src:
+        if pages is None:
+            pages = range(src.page_count)
+        pages = list(pages)
+        workers = max(1, min(OCR_WORKERS, len(pages)))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                per_page = list(ex.map(partial(ocr_page, src), pages))
+        else:
+            per_page = [ocr_page(src, pidx) for pidx in pages]
+    toks = TokenTable()
+    for page_toks in per_page:
+        toks.extend(page_toks)
+    return toks, "ocr"
+
+TEXT_EXTRACTORS = {"pdfplumber": tokens_pdfplumber, "pymupdf": tokens_pymupdf}
+
+def extractor_order():
+    """Orden de los extractores de texto. PyMuPDF suele ser mucho más rápido que
+    extract_words de pdfplumber, pero pdfplumber sigue primero por defecto para
+    no cambiar los JSON ya publicados."""
+    order = ["pymupdf", "pdfplumber"] if PYMUPDF_FIRST else ["pdfplumber", "pymupdf"]
+    return [name for name in order if name != "pymupdf" or fitz]
+
+def get_tokens(pdf_path, tel=None):
+    """Extrae los tokens abriendo el PDF una sola vez (PdfSource).
+
+    1. Sonda: la primera página con cada extractor de texto, en el orden de
+       extractor_order(), hasta que uno saque al menos MIN_PAGE_TOKENS tokens.
+    2. El que más sacó extrae el resto de las páginas; los demás no se usan.
+    3. Fallback página por página: las páginas vacías o con menos de
+       MIN_PAGE_TOKENS tokens (o todas, si el documento entero no llega a
+       MIN_TOKENS_THRESHOLD) pasan al resto de los extractores y por último a OCR;
+       en cada página queda el que más tokens sacó.
+
+    Si se pasa `tel` (Telemetry) anota el tiempo de cada extractor, la sonda,
+    cada fallback con su motivo y las páginas que fueron a OCR."""
+    tel = tel if tel is not None else Telemetry()
+    with open_source(pdf_path) as src:
+        order = extractor_order()
+        with tel.stage("open"):
+            n_pages = src.page_count
+
+        probe = {}
+        for name in order:
+            with tel.stage(f"extract:{name}"):
+                probe[name] = TEXT_EXTRACTORS[name](src, pages=[0])[0]
+            if len(probe[name]) >= MIN_PAGE_TOKENS:
+                break
+        best = max(probe, key=lambda name: len(probe[name]))  # empate: el primero del orden
+        tel.probe = {"tokens": {name: len(t) for name, t in probe.items()}, "chosen": best}
+
+        toks = TokenTable()
+        toks.extend(probe[best])
+        if n_pages > 1:
+            with tel.stage(f"extract:{best}"):
+                toks.extend(TEXT_EXTRACTORS[best](src, pages=range(1, n_pages))[0])
+        chosen = {p: (best, t) for p, t in toks.split_pages().items()}
+
+        def weak_pages():
+            total = sum(len(t) for _, t in chosen.values())
+            if total < MIN_TOKENS_THRESHOLD:
+                return list(range(n_pages)), f"{total} tokens en el documento (< {MIN_TOKENS_THRESHOLD})"
+            weak = [p for p in range(n_pages) if len(chosen.get(p, ("", []))[1]) < MIN_PAGE_TOKENS]
+            return weak, f"páginas con menos de {MIN_PAGE_TOKENS} tokens"
+
+        fallbacks = [(name, TEXT_EXTRACTORS[name]) for name in order if name != best] + [("ocr", tokens_ocr)]
+        for name, extractor in fallbacks:
+            weak, why = weak_pages()
+            if not weak:
+                break
+            fallback = {"extractor": name, "pages": [p + 1 for p in weak], "reason": why}
+            tel.fallbacks.append(fallback)
+            if name == "ocr":
+                if not ocr_available():
+                    fallback["skipped"] = "OCR no disponible"
+                    break
+                tel.ocr_pages.extend(p + 1 for p in weak)
+            alt = TokenTable()
+            if name in probe and 0 in weak:
+                alt.extend(probe[name])  # la primera página ya la leyó la sonda
+            todo = [p for p in weak if p or name not in probe]
+            if todo:
+                with tel.stage(f"extract:{name}"):
+                    alt.extend(extractor(src, pages=todo)[0])
+            for p, t in alt.split_pages().items():
+                if len(t) > len(chosen.get(p, ("", []))[1]):
+                    chosen[p] = (name, t)
+
+    toks, sources = TokenTable(), []
+    for p in sorted(chosen):
+        page_src, page_toks = chosen[p]
+        toks.extend(page_toks)
+        if page_src not in sources:
+            sources.append(page_src)
+    return toks, "+".join(sources) or best
@@ -8,8 +8,10 @@
 #
 # Uso sugerido (Windows):
 #   python parse_posiciones.py FECHA10.pdf --out posiciones.json --pretty --dump-text debug_pos.txt --dump-candidates cand.txt
+#   python parse_posiciones.py --batch . --pretty     (todas las fechas: Fecha NN/posiciones.json + historial.json)
 #
-import argparse, json, os, re, shutil, subprocess, sys
+import argparse, hashlib, io, json, os, re, shutil, subprocess, sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
 # 1) Utilidades ----------------------------------------------------------------
@@ -28,17 +30,70 @@ def to_float(s: str):
     except ValueError:
         return None
 
-def call_pdftotext(pdf_path: str):
-    if not shutil.which("pdftotext"):
-        return None
+def stream_pdftotext(pdf_path: str):
+    """Líneas de `pdftotext -layout` a medida que salen por el pipe (el texto
+    completo nunca está entero en memoria). CalledProcessError si falla."""
+    cmd = ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    finished = False
     try:
-        out = subprocess.check_output(
-            ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"],
-            stderr=subprocess.STDOUT
-        )
-        return out.decode("utf-8", errors="replace")
-    except Exception:
-        return None
+        yield from io.TextIOWrapper(proc.stdout, encoding="utf-8", errors="replace")
+        finished = True
+    finally:
+        if not finished:  # el que consume cortó antes: no dejar el proceso colgado
+            proc.kill()
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc:
+        raise subprocess.CalledProcessError(rc, cmd)
+
+def import_pymupdf():
+    try:
+        import pymupdf as fitz
+    except ImportError:
+        try:
+            import fitz
+        except ImportError:
+            return None
+    return fitz
+
+def layout_lines(words, y_tol=2.0):
+    """Palabras de PyMuPDF (x0, y0, x1, y1, texto, ...) -> líneas como las de
+    `pdftotext -layout`: cada palabra va a la columna que le toca por su x con el
+    ancho medio de carácter de la página, así las columnas quedan separadas por
+    2+ espacios y las palabras de un mismo nombre por uno."""
+    words = [w for w in words if w[4]]
+    if not words:
+        return
+    widths = sorted((w[2] - w[0]) / len(w[4]) for w in words)
+    char_w = widths[len(widths) // 2] or 1.0
+    x_min = min(w[0] for w in words)
+    rows = []
+    for w in sorted(words, key=lambda w: (w[1], w[0])):
+        if rows and w[1] - rows[-1][0] <= y_tol:
+            rows[-1][1].append(w)
+        else:
+            rows.append((w[1], [w]))
+    for _, row in rows:
+        line = ""
+        for w in sorted(row, key=lambda w: w[0]):
+            col = int(round((w[0] - x_min) / char_w))
+            line = line.ljust(max(col, len(line) + 1) if line else col) + w[4]
+        yield line + "\n"
+
+def stream_pymupdf(pdf_path: str):
+    """Texto con layout reconstruido con PyMuPDF en este mismo proceso (sin
+    lanzar pdftotext), de a una página; las páginas van separadas por \\f."""
+    fitz = import_pymupdf()
+    with fitz.open(pdf_path) as doc:
+        for pidx, page in enumerate(doc):
+            if pidx:
+                yield "\f"
+            words = page.get_text("words")
+            if page.rotation:  # planillas apaisadas: llevar las palabras a como se ven
+                m = page.rotation_matrix
+                words = [tuple(fitz.Rect(w[:4]) * m) + tuple(w[4:]) for w in words]
+            yield from layout_lines(words)
 
 def fallback_pdfminer(pdf_path: str):
     try:
@@ -58,15 +113,23 @@ IS_COL_HEADER = re.compile(r'^\s*Pos\.?\s+N(ro|º|°|o)?\b', flags=re.I)
 
 # Candidatas de fila: pos nro ...
 ROW_CANDIDATE = re.compile(r'^\s*(\d{1,3})\s+(\d{1,3})\s+(.+)$')
+SEPARATOR = re.compile(r'^[-–_]{3,}$')
+DETALLE = re.compile(r'^Detalle\s+de\s+puntos\b', flags=re.I)
+COLS_LAYOUT = re.compile(r'\s{2,}')
+COLS_WS = re.compile(r'\s+')
+FIN_TOKEN = re.compile(r'\d{1,2}')
+FIN_EOL = re.compile(r'(\d{1,2})\s*$')
 
 def tokenize_layout(line: str):
-    parts = re.split(r'\s{2,}', line.strip())
+    line = line.strip()
+    parts = COLS_LAYOUT.split(line)
     if len(parts) <= 2:
-        parts = re.split(r'\s+', line.strip())
+        parts = COLS_WS.split(line)
     return [p for p in parts if p != '']
 
-def parse_row(line: str):
-    m = ROW_CANDIDATE.match(line)
+def parse_row(line: str, m=None):
+    """Fila de la tabla -> dict. m: el match de ROW_CANDIDATE si ya se hizo."""
+    m = m or ROW_CANDIDATE.match(line)
     if not m: 
         return None
     try:
@@ -103,14 +166,12 @@ def parse_row(line: str):
     # Fin: entero suelto en tokens resto o al final de la línea
     fin = None
     for tok in rest_tokens:
-        if re.fullmatch(r'\d{1,2}', tok):
-            try: fin = int(tok); break
-            except: pass
+        if FIN_TOKEN.fullmatch(tok):
+            fin = int(tok); break
     if fin is None:
-        mfin = re.search(r'(\d{1,2})\s*$', line)
+        mfin = FIN_EOL.search(line)
         if mfin:
-            try: fin = int(mfin.group(1))
-            except: fin = None
+            fin = int(mfin.group(1))
 
     extras_raw = " ".join(rest_tokens).strip() or None
 
@@ -121,126 +182,361 @@ def parse_row(line: str):
         "fin": fin, "extras_raw": extras_raw
     }
 
-# 3) Extractor de bloques “cumplidas N fechas” --------------------------------
-def extract_blocks(full_text: str):
-    """Devuelve lista de (n_fechas, texto_del_bloque). Un bloque se extiende hasta:
-       - el próximo encabezado 'cumplidas N fechas', o
-       - 'Detalle de puntos', o
-       - fin del documento.
-    """
-    blocks = []
-    matches = list(HDR.finditer(full_text))
-    for i, m in enumerate(matches):
-        n_fechas = int(m.group(1))
-        start = m.end()
-        if i + 1 < len(matches):
-            end = matches[i+1].start()
-        else:
-            # intentar cortar por "Detalle de puntos" si aparece más adelante
-            tail = full_text[start:]
-            cut = re.search(r'(?:\n|\r)Detalle\s+de\s+puntos', tail, flags=re.I)
-            end = start + cut.start() if cut else len(full_text)
-        block_text = full_text[start:end]
-        blocks.append((n_fechas, block_text))
-    return blocks
-
-# 4) Parseo de filas SOLO dentro de esos bloques --------------------------------
-def parse_rows_in_block(block_text: str):
-    lines = block_text.splitlines()
-    rows, candidates = [], []
-    in_table = False
-    for ln in lines:
-        s = ln.strip()
-        if not s: 
-            continue
-        if not in_table:
-            # Activar cuando encontremos cabecera de columnas o una primer fila clara
-            if IS_COL_HEADER.match(s) or ROW_CANDIDATE.match(s):
-                in_table = True
+# 3) Máquina de estados línea por línea -----------------------------------------
+# Una sola pasada sobre el texto, sin tenerlo entero en memoria:
+#   FUERA  --"cumplidas N fechas"-->  BLOQUE  --cabecera o 1ª fila-->  TABLA
+#   cualquier estado --"Detalle de puntos"--> FUERA (los anexos no se leen)
+#   cualquier estado --otro encabezado "cumplidas N fechas"--> BLOQUE
+FUERA, BLOQUE, TABLA = range(3)
+
+class StandingsParser:
+    """Consume líneas con feed() y va juntando las filas ya deduplicadas por
+    (pos, nro, nombre). result() arma lo que va a posiciones.json."""
+
+    def __init__(self, keep_candidates=False):
+        self.state = FUERA
+        self.rows = []
+        self.seen = set()
+        self.fechas = set()
+        self.candidates = [] if keep_candidates else None
+
+    def feed(self, line: str):
+        h = HDR.search(line)
+        if h:
+            self.fechas.add(int(h.group(1)))
+            self.state = BLOQUE
+            line = line[h.end():]  # lo que sigue al encabezado ya es del bloque
+        if self.state == FUERA:
+            return
+        s = line.strip()
+        if not s:
+            return
+        if DETALLE.match(s):
+            self.state = FUERA
+            return
+        # Cabeceras y separadores: activan la tabla pero no son filas
+        if IS_COL_HEADER.match(s):
+            self.state = TABLA
+            return
+        if SEPARATOR.match(s):
+            return
+        m = ROW_CANDIDATE.match(s)
+        if not m:
+            return
+        self.state = TABLA
+        if self.candidates is not None:
+            self.candidates.append(line.rstrip("\r\n"))
+        row = parse_row(s, m)
+        if row:
+            key = (row["pos"], row["nro"], row["nombre"].lower())
+            if key not in self.seen:
+                self.seen.add(key); self.rows.append(row)
+
+    def result(self, source_pdf: str):
+        """(data, candidatas). Si hubiera varios encabezados vale el mayor N."""
+        if not self.fechas:
+            print(f"[ADVERTENCIA] {source_pdf}: no se detectaron bloques 'cumplidas N fechas'.", file=sys.stderr)
+        meta = {
+            "source_pdf": source_pdf,
+            "extracted_at_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "fechas_cumplidas": max(self.fechas) if self.fechas else None,
+            "fechas_detectadas": sorted(self.fechas)
+        }
+        return {"meta": meta, "standings": self.rows}, self.candidates or []
+
+# 4) Texto con caché por hash ----------------------------------------------------
+# Extraer es lo caro (pdfminer tarda segundos por PDF); el parseo del texto es
+# instantáneo. Se cachea el texto por sha256 del PDF + extractor usado.
+# PyMuPDF va primero: corre en este proceso y saca el mismo texto que
+# `pdftotext -layout` (columnas separadas por 2+ espacios) en una fracción del
+# tiempo de pdfminer.
+CACHE_DIR = "./.cache_posiciones"
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+TEXT_BACKENDS = ("pymupdf", "pdftotext", "pdfminer")
+
+def text_backend():
+    """PyMuPDF en proceso si está; si no pdftotext (un proceso por PDF); si no
+    pdfminer. TIEMPOS_POSICIONES_TEXTO (o --text-backend) fuerza uno."""
+    forced = os.environ.get("TIEMPOS_POSICIONES_TEXTO")
+    if forced in TEXT_BACKENDS:
+        return forced
+    if import_pymupdf():
+        return "pymupdf"
+    return "pdftotext" if shutil.which("pdftotext") else "pdfminer"
+
+def usable_backend(method):
+    """method si está instalado; si no (p.ej. forzaron pdftotext y no está en el
+    PATH), avisa y sigue con pdfminer."""
+    missing = ((method == "pymupdf" and not import_pymupdf())
+               or (method == "pdftotext" and not shutil.which("pdftotext")))
+    if missing:
+        print(f"[ADVERTENCIA] {method} no está disponible; uso pdfminer.", file=sys.stderr)
+        return "pdfminer"
+    return method
+
+def iter_text_lines(pdf_path: str, cache_dir=CACHE_DIR, method=None):
+    """Líneas del texto del PDF (ver text_backend). Con cache_dir se van
+    copiando a la caché mientras se leen, y un PDF ya visto (mismo contenido)
+    se lee directo de ahí."""
+    method = usable_backend(method or text_backend())
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(cache_dir, f"{file_sha256(pdf_path)}.{method}.txt")
+        try:
+            with open(cache_file, encoding="utf-8", newline="") as f:
+                yield from f
+            return
+        except OSError:
+            pass
+
+    def source():
+        if method == "pymupdf":
+            yield from stream_pymupdf(pdf_path)
+            return
+        if method == "pdftotext":
+            lines = stream_pdftotext(pdf_path)
+            try:
+                first = next(lines, None)
+            except (subprocess.CalledProcessError, OSError):
+                first = None  # no arrancó o falló antes de escribir nada: probar con pdfminer
             else:
-                continue
-        # Saltar cabeceras y separadores
-        if IS_COL_HEADER.match(s) or re.match(r'^[-–_]{3,}$', s):
+                if first is not None:
+                    yield first
+                    yield from lines
+                    return
+        yield from fallback_pdfminer(pdf_path).splitlines(keepends=True)
+
+    if not cache_file:
+        yield from source()
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as out:
+            for line in source():
+                out.write(line)
+                yield line
+        os.replace(tmp, cache_file)  # sólo si se leyó completo
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+# 5) Parseo de un PDF completo ---------------------------------------------------
+def parse_lines(lines, source_pdf: str, keep_candidates=False, text_out=None):
+    """Líneas de texto -> (data, candidatas). Con text_out (archivo abierto) se
+    copia ahí el texto a medida que pasa."""
+    parser = StandingsParser(keep_candidates)
+    for line in lines:
+        if text_out is not None:
+            text_out.write(line)
+        parser.feed(line)
+    return parser.result(source_pdf)
+
+def parse_pdf(pdf_path: str, cache_dir=CACHE_DIR, keep_candidates=False, text_out=None):
+    """(data, candidatas) de un PDF de posiciones, leyendo el texto de a una línea."""
+    return parse_lines(iter_text_lines(pdf_path, cache_dir), os.path.basename(pdf_path),
+                       keep_candidates, text_out)
+
+def write_json(path, data, pretty=False):
+    """Escribe el JSON; si lo único que cambió es extracted_at_utc, no toca el
+    archivo (así no hay nada nuevo para subir). True si escribió."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            old = json.load(f)
+        same = dict(old.get("meta", {}), extracted_at_utc=None) == dict(data.get("meta", {}), extracted_at_utc=None)
+        if same and {k: v for k, v in old.items() if k != "meta"} == {k: v for k, v in data.items() if k != "meta"}:
+            return False
+    except (OSError, ValueError, AttributeError):
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        if pretty:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return True
+
+# Servidor de extracción (servidor_pdf.py en la raíz del repo): si está corriendo,
+# el PDF se parsea ahí, con PyMuPDF ya cargado, y este proceso sólo escribe.
+# La clave es la misma que usa el servidor: TIEMPOS_WORKER_KEY o ~/.tiempos_worker_key.
+WORKER_ADDRESS = os.environ.get("TIEMPOS_WORKER", "127.0.0.1:47291")
+WORKER_KEY_FILE = os.environ.get("TIEMPOS_WORKER_KEY_FILE",
+                                 os.path.join(os.path.expanduser("~"), ".tiempos_worker_key"))
+
+def worker_authkey():
+    key = os.environ.get("TIEMPOS_WORKER_KEY", "").encode()
+    if not key:
+        try:
+            with open(WORKER_KEY_FILE, "rb") as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+    return key if len(key) >= 16 else None
+
+def parse_pdf_via_worker(pdf_path: str, address=None, cache_dir=CACHE_DIR):
+    """data del servidor de extracción, o None si no hay servidor (o falló)."""
+    from multiprocessing.connection import AuthenticationError, Client
+    authkey = worker_authkey()
+    if not authkey:
+        print(f"[ADVERTENCIA] Sin clave del servidor (TIEMPOS_WORKER_KEY o {WORKER_KEY_FILE}); "
+              "parseo en este proceso.", file=sys.stderr)
+        return None
+    host, _, port = (address or WORKER_ADDRESS).rpartition(":")
+    try:
+        with Client((host or "127.0.0.1", int(port)), authkey=authkey) as conn:
+            conn.send({"op": "standings", "path": os.path.abspath(pdf_path),
+                       "cache_dir": os.path.abspath(cache_dir) if cache_dir else None})
+            reply = conn.recv()
+    except (OSError, EOFError, ValueError, AuthenticationError):
+        return None
+    if not reply.get("ok"):
+        print(f"[ADVERTENCIA] El servidor de extracción falló:\n{reply.get('error')}", file=sys.stderr)
+        return None
+    return reply["result"]
+
+# 6) Modo batch: una carpeta con los PDFs de todas las fechas ---------------------
+HISTORY_FILE = "historial.json"
+RE_FECHA_NUM = re.compile(r'fecha\D*(\d+)', flags=re.I)
+
+def fecha_number(pdf_path: str, data):
+    """Número de fecha: del nombre del archivo (FECHA10.pdf) o, si no lo tiene,
+    de 'cumplidas N fechas'."""
+    m = RE_FECHA_NUM.search(os.path.basename(pdf_path))
+    if m:
+        return int(m.group(1))
+    return data["meta"].get("fechas_cumplidas")
+
+def _parse_job(pdf_path, cache_dir):
+    data, _ = parse_pdf(pdf_path, cache_dir)
+    return pdf_path, data
+
+def build_history(per_fecha):
+    """Historial de la temporada: por piloto, posición y total en cada fecha
+    (listas alineadas con "fechas"; None si no figura en esa fecha)."""
+    fechas = sorted(per_fecha)
+    pilotos = {}
+    for i, n in enumerate(fechas):
+        for r in per_fecha[n]["standings"]:
+            key = f"{r.get('nro')}|{(r.get('nombre') or '').lower()}"
+            p = pilotos.setdefault(key, {"nro": r.get("nro"), "nombre": r.get("nombre"),
+                                         "pos": [None] * len(fechas), "total": [None] * len(fechas)})
+            p["pos"][i] = r.get("pos")
+            p["total"][i] = r.get("total")
+    # orden: posición en la última fecha en la que figura
+    def last_pos(p):
+        for pos in reversed(p["pos"]):
+            if pos is not None:
+                return (0, pos)
+        return (1, 0)
+    history = sorted(pilotos.values(), key=lambda p: (last_pos(p), p["nro"] or 0, p["nombre"] or ""))
+    return {"meta": {"extracted_at_utc": datetime.now(timezone.utc).isoformat(timespec="seconds")},
+            "fechas": fechas, "pilotos": history}
+
+def run_batch(pdf_dir, out_dir=None, jobs=0, cache_dir=CACHE_DIR, pretty=False):
+    """Procesa todos los PDFs de pdf_dir (en paralelo) y escribe
+    <out_dir>/Fecha NN/posiciones.json, <out_dir>/historial.json y
+    <out_dir>/posiciones.json con la última fecha (la que muestra posiciones.html)."""
+    out_dir = out_dir or pdf_dir
+    pdfs = sorted(os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    if not pdfs:
+        print(f"[ERROR] No hay PDFs en {pdf_dir}", file=sys.stderr)
+        return 2
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if jobs > 1 and len(pdfs) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pdfs))) as ex:
+            results = list(ex.map(_parse_job, pdfs, [cache_dir] * len(pdfs)))
+    else:
+        results = [_parse_job(p, cache_dir) for p in pdfs]
+
+    per_fecha = {}
+    written = 0
+    for pdf_path, data in results:
+        n = fecha_number(pdf_path, data)
+        if n is None:
+            print(f"[ADVERTENCIA] {pdf_path}: no pude deducir la fecha, lo salteo.", file=sys.stderr)
             continue
-        if ROW_CANDIDATE.match(s):
-            candidates.append(ln)
-            row = parse_row(ln)
-            if row:
-                rows.append(row)
-        # Cortes duros del bloque
-        if re.match(r'^(?:Detalle\s+de\s+puntos)\b', s, flags=re.I):
-            break
-    return rows, candidates
-
-# 5) Main ----------------------------------------------------------------------
+        if n in per_fecha:
+            print(f"[ADVERTENCIA] Fecha {n} repetida ({pdf_path}); queda la última.", file=sys.stderr)
+        per_fecha[n] = data
+        written += write_json(os.path.join(out_dir, f"Fecha {n:02d}", "posiciones.json"), data, pretty)
+    if not per_fecha:
+        return 1
+    written += write_json(os.path.join(out_dir, HISTORY_FILE), build_history(per_fecha), pretty)
+    written += write_json(os.path.join(out_dir, "posiciones.json"), per_fecha[max(per_fecha)], pretty)
+    print(f"[OK] {len(per_fecha)} fechas ({min(per_fecha)}-{max(per_fecha)}) desde {len(pdfs)} PDFs; "
+          f"{written} archivos escritos en {out_dir}.")
+    return 0
+
+# 7) Main ----------------------------------------------------------------------
 def main():
     ap = argparse.ArgumentParser(description="Extrae SOLO 'Posiciones en el campeonato cumplidas N fechas'")
-    ap.add_argument("pdf", help="Ruta al PDF (ej: FECHA10.pdf)")
+    ap.add_argument("pdf", nargs="?", help="Ruta al PDF (ej: FECHA10.pdf)")
     ap.add_argument("--out", default="posiciones.json", help="Archivo JSON de salida")
     ap.add_argument("--pretty", action="store_true", help="Indentación legible")
     ap.add_argument("--dump-text", default=None, help="Guardar texto completo extraído en .txt")
     ap.add_argument("--dump-candidates", default=None, help="Guardar líneas candidatas en .txt")
+    ap.add_argument("--batch", metavar="DIR", default=None,
+                    help="Procesar todos los PDFs de DIR: un posiciones.json por fecha + historial.json")
+    ap.add_argument("--out-dir", default=None, help="(--batch) carpeta de salida (default: DIR)")
+    ap.add_argument("--jobs", "-j", type=int, default=0, help="(--batch) procesos en paralelo (0 = todos los núcleos)")
+    ap.add_argument("--cache-dir", default=CACHE_DIR, help="Caché del texto extraído (por hash del PDF)")
+    ap.add_argument("--no-cache", action="store_true", help="No usar la caché de texto")
+    ap.add_argument("--text-backend", choices=TEXT_BACKENDS, default=None,
+                    help="Cómo sacar el texto (default: pymupdf si está, si no pdftotext, si no pdfminer)")
+    ap.add_argument("--worker", nargs="?", const=WORKER_ADDRESS, default=None, metavar="HOST:PUERTO",
+                    help="Parsear en el servidor de extracción si está corriendo (python process_pdfs.py worker)")
     args = ap.parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.text_backend:
+        os.environ["TIEMPOS_POSICIONES_TEXTO"] = args.text_backend  # también para los procesos de --batch
+
+    if args.batch:
+        if not os.path.isdir(args.batch):
+            print(f"[ERROR] No existe la carpeta: {args.batch}", file=sys.stderr); sys.exit(2)
+        sys.exit(run_batch(args.batch, args.out_dir, args.jobs, cache_dir, args.pretty))
 
+    if not args.pdf:
+        ap.error("falta el PDF (o --batch DIR)")
     if not os.path.isfile(args.pdf):
         print(f"[ERROR] No existe: {args.pdf}", file=sys.stderr); sys.exit(2)
 
-    text = call_pdftotext(args.pdf)
-    if text is None:
-        text = fallback_pdfminer(args.pdf)
-
-    if args.dump_text:
-        with open(args.dump_text, "w", encoding="utf-8") as f:
-            f.write(text)
-
-    blocks = extract_blocks(text)
-    if not blocks:
-        print("[ADVERTENCIA] No se detectaron bloques 'cumplidas N fechas'.", file=sys.stderr)
-
-    all_rows = []
-    all_candidates = []
-    fechas_set = set()
-    for n_fechas, block_text in blocks:
-        fechas_set.add(n_fechas)
-        rows, cands = parse_rows_in_block(block_text)
-        all_rows.extend(rows)
-        all_candidates.extend(cands)
-
-    # Deduplicar por (pos, nro, nombre)
-    seen = set()
-    uniq_rows = []
-    for r in all_rows:
-        key = (r.get("pos"), r.get("nro"), (r.get("nombre") or "").lower())
-        if key not in seen:
-            seen.add(key); uniq_rows.append(r)
+    data, all_candidates = None, []
+    if args.worker and not (args.dump_text or args.dump_candidates):
+        data = parse_pdf_via_worker(args.pdf, args.worker, cache_dir)
+        if data is None:
+            print(f"[INFO] Sin servidor de extracción en {args.worker}; parseo acá.")
+    if data is None:
+        text_out = open(args.dump_text, "w", encoding="utf-8", newline="") if args.dump_text else None
+        try:
+            data, all_candidates = parse_pdf(args.pdf, cache_dir, bool(args.dump_candidates), text_out)
+        finally:
+            if text_out:
+                text_out.close()
 
     if args.dump_candidates:
         with open(args.dump_candidates, "w", encoding="utf-8") as f:
             f.write("\n".join(all_candidates))
 
-    # Elegir la mayor cantidad de fechas cumplidas (por si hubieran varias)
-    fechas_cumplidas = max(fechas_set) if fechas_set else None
-
-    meta = {
-        "source_pdf": os.path.basename(args.pdf),
-        "extracted_at_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
-        "fechas_cumplidas": fechas_cumplidas,
-        "fechas_detectadas": sorted(list(fechas_set)) if fechas_set else []
-    }
-
-    data = {"meta": meta, "standings": uniq_rows}
-
     with open(args.out, "w", encoding="utf-8") as f:
         if args.pretty:
             json.dump(data, f, ensure_ascii=False, indent=2)
         else:
             json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
 
-    print(f"[OK] Escribí {args.out} con {len(uniq_rows)} filas.")
+    print(f"[OK] Escribí {args.out} con {len(data['standings'])} filas.")
     if args.dump_candidates:
         print(f"[INFO] Guardé líneas candidatas en: {args.dump_candidates}")
-    if fechas_cumplidas is not None:
-        print(f"[INFO] Fechas cumplidas detectadas: {fechas_cumplidas}")
+    if data["meta"]["fechas_cumplidas"] is not None:
+        print(f"[INFO] Fechas cumplidas detectadas: {data['meta']['fechas_cumplidas']}")
 
 if __name__ == "__main__":
     main()
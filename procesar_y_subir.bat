@@ -11,7 +11,14 @@ echo.
 echo === Repo: %REPO% ^| Rama: main ===
 git status -s
 
-rem 1) Generar/actualizar JSONs y manifiestos
+rem subir_jsons.py toma el repo de TIEMPOS_REPO
+set "TIEMPOS_REPO=%REPO%"
+
+rem 1) Generar/actualizar JSONs y manifiestos, y subir SOLO los archivos que cambiaron
+rem    (process_pdfs.py llama a subir_jsons: un commit, pull --rebase y push con reintentos)
+rem    Si dejaste corriendo "%PY% process_pdfs.py worker" en otra ventana, agrega --worker:
+rem    la extraccion corre ahi con las librerias de PDF ya cargadas.
+rem    (la primera vez: "%PY% process_pdfs.py worker --new-key" crea la clave compartida)
 echo.
 echo [INFO] Ejecutando: %PY% process_pdfs.py
 %PY% process_pdfs.py
@@ -20,30 +27,6 @@ if errorlevel 1 (
   exit /b 1
 )
 
-rem 2) Preparar commit
-echo.
-echo [INFO] Preparando commit...
-git add -A
-
-rem Si no hay cambios, no falla
-git diff --cached --quiet
-if errorlevel 1 (
-  for /f "tokens=1-3 delims=/ " %%a in ('date /t') do set FECHA=%%c-%%b-%%a
-  for /f "tokens=1-2 delims=: " %%a in ('time /t') do set HORA=%%a%%b
-  git commit -m "[auto] actualizar jsons y manifiestos %FECHA% %HORA%"
-) else (
-  echo [INFO] No hay cambios para commitear.
-)
-
-rem 3) Empujar SIEMPRE local -> remoto (pisa remoto con --force-with-lease)
-echo.
-echo [INFO] Sincronizando con GitHub (local -> remoto)...
-git push --force-with-lease origin main
-if errorlevel 1 (
-  echo [ERROR] No se pudo pushear. Verificar red/credenciales o rama protegida.
-  exit /b 1
-)
-
 echo.
 echo [OK] Listo.
 exit /b 0
@@ -1,36 +1,41 @@
 # coding: utf-8
-import os, re, json
+import time
+_T_START = time.perf_counter()  # para medir el arranque de la CLI
+import os, re, sys, gzip, json, argparse, unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache, partial
 from pathlib import Path
+from queue import Empty, Queue
+from typing import Optional
 
-import pdfplumber
+# La extracción vive en extractores.py (backends de carga diferida); lo que sigue
+# se re-exporta para que process_pdfs.X siga funcionando como antes.
+import escaneo
+import extractores
+from extractores import (
+    LazyImport, np, fitz, pdfplumber, pytesseract, convert_from_path, Image,
+    MIN_PAGE_TOKENS, MIN_TOKENS_THRESHOLD, norm, Token, TokenTable, Telemetry,
+    PdfSource, open_source, tokens_pdfplumber, tokens_pymupdf, tokens_ocr,
+    ocr_available, extractor_order, get_tokens,
+)
 
-try:
-    import fitz  # PyMuPDF
-except Exception:
-    fitz = None
-
-try:
-    from pdf2image import convert_from_path
-    import pytesseract
-except Exception:
-    convert_from_path = None
-    pytesseract = None
+brotli = LazyImport("brotli")                   # opcional: .br además de .gz
+WatchdogObserver = LazyImport("watchdog.observers", "Observer")
 
 # ==== CONFIG ====
 PDF_DIR = "./pdfs"
 OUTPUT_DIR = "./resultados"
-DEBUG_DIR = os.path.join(OUTPUT_DIR, "_debug")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(DEBUG_DIR, exist_ok=True)
-
-# Opcional (Windows): seteá si tu sistema no los encuentra solo
-TESSERACT_CMD = None  # r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-POPPLER_PATH = None   # r"C:\poppler\Library\bin"
-if pytesseract and TESSERACT_CMD:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+DEBUG_DIR = os.path.join(OUTPUT_DIR, "_debug")   # se crean recién al escribir
+# Tiempos de cada corrida: cambian siempre, así que van fuera de resultados/ (no se suben)
+TELEMETRY_DIR = "./.telemetria"
 
-OCR_DPI = 300
-MIN_TOKENS_THRESHOLD = 25  # si hay menos, intentamos siguiente extractor
+# ==== Caché de extracción (por contenido del PDF) ====
+# Subí PARSER_VERSION cuando cambie la extracción o el parseo: invalida todo lo cacheado.
+PARSER_VERSION = "5"
+CACHE_DIR = "./.cache_pdfs"
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
 
 # ==== Manifiestos (fechas.json e index.json) ====
 ORDER_MAP = {"serie": 1, "repechaje": 2, "semifinal": 3, "prefinal": 4, "final": 5}
@@ -50,44 +55,243 @@ def load_json(path, default):
     except Exception:
         return default
 
+def dump_json_bytes(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+def write_bytes_atomic(path, payload: bytes) -> bool:
+    """Escribe vía archivo temporal + rename, y sólo si el contenido cambió
+    (así no se ensucia el mtime ni git tiene que re-hashear). True si escribió."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == payload:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+    return True
+
 def save_json(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    return write_bytes_atomic(path, dump_json_bytes(data))
+
+class OutputWriter:
+    """Capa de escritura para resultados/: no toca los archivos idénticos,
+    escribe los cambiados de forma atómica y lleva la cuenta de la corrida."""
+
+    def __init__(self):
+        self.written = []
+        self.skipped = []
+        self.removed = []
+
+    def write_bytes(self, path, payload: bytes) -> bool:
+        changed = write_bytes_atomic(path, payload)
+        (self.written if changed else self.skipped).append(path)
+        return changed
+
+    def write_json(self, path, data) -> bool:
+        return self.write_bytes(path, dump_json_bytes(data))
+
+    def remove(self, path) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Aviso: no pude borrar {path} ({e})")
+            return False
+        self.removed.append(path)
+        return True
+
+    @property
+    def changed(self):
+        """Rutas escritas o borradas en esta corrida (lo que hay que subir)."""
+        return self.written + self.removed
+
+    def summary(self):
+        return (f"{len(self.written)} escritos, {len(self.skipped)} sin cambios, "
+                f"{len(self.removed)} borrados")
+
+def cache_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}.v{PARSER_VERSION}.json")
+
+def cache_get(digest: str):
+    path = cache_path(digest)
+    entry = load_json(path, None)
+    if not entry or entry.get("parser_version") != PARSER_VERSION:
+        return None
+    try:
+        os.utime(path, None)  # marca de uso para el desalojo LRU
+    except OSError:
+        pass
+    return entry
+
+def cache_put(digest: str, entry: dict):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(digest)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(entry, parser_version=PARSER_VERSION), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def cache_evict(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+    """Borra las entradas menos usadas (por mtime) hasta respetar ambos topes.
+    Las de otra PARSER_VERSION ya no sirven y se borran siempre."""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    entries = []
+    removed = 0
+    for fn in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, fn)
+        if not fn.endswith(".json"):
+            continue
+        if not fn.endswith(f".v{PARSER_VERSION}.json"):
+            try:
+                os.remove(path); removed += 1
+            except OSError:
+                pass
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort(reverse=True)  # más recientes primero
+    total = 0
+    for i, (_, size, path) in enumerate(entries):
+        total += size
+        if i >= max_entries or total > max_bytes:
+            try:
+                os.remove(path); removed += 1
+            except OSError:
+                pass
+    return removed
+
+def fecha_sort_key(s: str):
+    m = re.search(r"\d+", s)
+    return int(m.group()) if m else 0
+
+RE_FECHA_DIR = re.compile(r"^Fecha\s*\d+$", re.IGNORECASE)
+RE_RACE_FILE = re.compile(r"^(serie\d+|repechaje\d+|semifinal\d+|prefinal|final)$")
+
+class ManifestBuilder:
+    """Junta en memoria las carreras de una corrida y escribe fechas.json y cada
+    index.json una sola vez, al final, de forma atómica y sólo si cambiaron.
+
+    write(merge=True) suma lo juntado a lo que ya está en disco (lo que hacía
+    update_manifests después de cada PDF) y saca lo anotado con remove();
+    write(merge=False) deja los manifiestos exactamente como lo juntado (lo que
+    hace el rebuild)."""
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir or OUTPUT_DIR
+        self.fechas = {}   # fecha_dir -> set(races)
+        self.removed = {}  # fecha_dir -> set(races) que ya no están
+
+    def add(self, fecha_dir: str, race: str = None):
+        races = self.fechas.setdefault(fecha_dir, set())
+        if race and race != "unknown":
+            races.add(race)
+        return self
+
+    def remove(self, fecha_dir: str, race: str):
+        self.fechas.setdefault(fecha_dir, set()).discard(race)
+        self.removed.setdefault(fecha_dir, set()).add(race)
+        return self
+
+    def scan_disk(self):
+        """Agrega las carreras que hay en resultados/<Fecha N>/*.json."""
+        for nombre in os.listdir(self.output_dir):
+            fecha_dir = os.path.join(self.output_dir, nombre)
+            if not (os.path.isdir(fecha_dir) and RE_FECHA_DIR.match(nombre)):
+                continue
+            self.add(nombre)
+            for fn in os.listdir(fecha_dir):
+                if not fn.lower().endswith(".json") or fn.lower() == "index.json":
+                    continue
+                base = os.path.splitext(fn)[0].lower()
+                # aceptar nombres válidos
+                if RE_RACE_FILE.match(base):
+                    self.add(nombre, base)
+        return self
+
+    def write(self, merge=False, writer=None):
+        """Escribe los manifiestos (vía writer, un OutputWriter) y devuelve la
+        lista de fechas que quedó en fechas.json."""
+        writer = writer or OutputWriter()
+        emptied = set()
+        for fecha_dir, races in self.fechas.items():
+            index_path = os.path.join(self.output_dir, fecha_dir, "index.json")
+            if merge:
+                races = races | set(load_json(index_path, {"races": []}).get("races", []))
+                races -= self.removed.get(fecha_dir, set())
+            if races:
+                writer.write_json(index_path, {"races": sorted(races, key=race_sort_key)})
+            elif not merge or fecha_dir in self.removed:
+                # si no tiene carreras, eliminar index vacío (si existiera)
+                writer.remove(index_path)
+                emptied.add(fecha_dir)
+
+        fechas_path = os.path.join(self.output_dir, "fechas.json")
+        if merge:
+            fechas = (set(load_json(fechas_path, {"fechas": []}).get("fechas", [])) | set(self.fechas)) - emptied
+        else:
+            # solo fechas que tengan al menos 1 carrera
+            fechas = {f for f, races in self.fechas.items() if races}
+        fechas = sorted(fechas, key=fecha_sort_key)
+        writer.write_json(fechas_path, {"fechas": fechas})
+        return fechas
 
 def update_manifests(fecha_dir: str, race: str):
     """
     Asegura que:
       - resultados/fechas.json contenga 'Fecha N'
       - resultados/Fecha N/index.json contenga 'race'
-    (Durante el procesado. Luego se hace un rebuild global que “limpia”.)
+    Escribe en el momento; en una corrida completa conviene juntar todo en un
+    ManifestBuilder y escribir una sola vez.
     """
-    fechas_path = os.path.join(OUTPUT_DIR, "fechas.json")
-    fechas = load_json(fechas_path, {"fechas": []})
-    if fecha_dir not in fechas["fechas"]:
-        fechas["fechas"].append(fecha_dir)
-        fechas["fechas"].sort(key=lambda s: int(re.search(r"\d+", s).group()) if re.search(r"\d+", s) else 0)
-        save_json(fechas_path, fechas)
-
-    if race and race != "unknown":
-        index_path = os.path.join(OUTPUT_DIR, fecha_dir, "index.json")
-        index = load_json(index_path, {"races": []})
-        if race not in index["races"]:
-            index["races"].append(race)
-            index["races"].sort(key=race_sort_key)
-            save_json(index_path, index)
+    ManifestBuilder().add(fecha_dir, race).write(merge=True)
 
 # === Utilidades de normalización ===
-def norm(s: str) -> str:
-    if s is None: return ""
-    s = s.replace("\u00A0", " ")
-    s = re.sub(r"[ \t]+", " ", s)
-    return s.strip()
+RE_INT = re.compile(r"\d+")
+RE_TIME = re.compile(r"^\d{1,2}[:.]\d{2}([.,]\d{2,3})?$")   # sobre el texto con "," -> "."
+RE_NUM = re.compile(r"\d+[.,]?\d*")
+RE_NO_LAP = re.compile(r"N/L|-", re.IGNORECASE)
+RE_SEP = re.compile(r"[:\.,]")
+RE_MMSS = re.compile(r"\d{1,2}[:.]\d{2}")
+RE_FRAC = re.compile(r"\d{2,3}")
+RE_TIME_PARTS = re.compile(r"^(\d{1,2}):(\d{2})(?:[.,](\d{2,3}))?$")
 
 def is_time_token(tok: str) -> bool:
     if not tok: return False
-    t = tok.replace(",", ".")
-    return bool(re.match(r"^\d{1,2}[:.]\d{2}([.,]\d{2,3})?$", t))
+    return RE_TIME.match(tok.replace(",", ".")) is not None
+
+# Clases de token (bits; un token puede tener varias, p.ej. "1.31" es TIME y NUM)
+TK_INT = 1     # entero: 05, 46, 129
+TK_TIME = 2    # tiempo: 1:21.416, 1.21, 1:21
+TK_NUM = 4     # número con o sin decimales: 0, 1.5, 2,
+TK_SEP = 8     # separador suelto: "." "," ":"
+TK_NO_LAP = 16 # N/L o "-"
+
+@lru_cache(maxsize=8192)
+def classify_token(tok: str) -> int:
+    """Clasifica un texto una sola vez (cacheado: los textos se repiten mucho)."""
+    if not tok:
+        return 0
+    if RE_INT.fullmatch(tok):
+        return TK_INT | TK_NUM
+    cls = 0
+    if RE_SEP.fullmatch(tok):
+        cls |= TK_SEP
+    if RE_TIME.match(tok.replace(",", ".")):
+        cls |= TK_TIME
+    if RE_NUM.fullmatch(tok):
+        cls |= TK_NUM
+    if RE_NO_LAP.fullmatch(tok):
+        cls |= TK_NO_LAP
+    return cls
 
 def join_time_tokens(tokens_line):
     """Une tokens tipo 1:21 . 416 -> 1:21.416 y 1 : 21 , 416 -> 1:21,416."""
@@ -98,7 +302,7 @@ def join_time_tokens(tokens_line):
         if i+2 < len(tokens_line):
             nxt = tokens_line[i+1]["text"]
             nxt2 = tokens_line[i+2]["text"]
-            if re.fullmatch(r"[:\.,]", nxt) and re.fullmatch(r"\d{2,3}", nxt2) and re.fullmatch(r"\d{1,2}[:.]\d{2}", cur.replace(" ", "")):
+            if RE_SEP.fullmatch(nxt) and RE_FRAC.fullmatch(nxt2) and RE_MMSS.fullmatch(cur.replace(" ", "")):
                 merged = (cur + nxt + nxt2).replace(" ", "")
                 tokens_line[i]["text"] = merged
                 i += 3
@@ -121,7 +325,7 @@ def time_to_seconds(s):
     s = s.replace(",", ".")
     if ":" not in s and "." in s:
         s = s.replace(".", ":", 1)
-    m = re.match(r"^(\d{1,2}):(\d{2})(?:[.,](\d{2,3}))?$", s)
+    m = RE_TIME_PARTS.match(s)
     if not m: return None
     mm = int(m.group(1))
     ss = int(m.group(2))
@@ -129,106 +333,174 @@ def time_to_seconds(s):
     frac = float(f"0.{ms}") if ms else 0.0
     return mm*60 + ss + frac
 
-# === Extracción de TOKENS con coordenadas ===
-def tokens_pdfplumber(pdf_path):
-    toks = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for pidx, page in enumerate(pdf.pages):
-                for w in page.extract_words(use_text_flow=True) or []:
-                    toks.append({
-                        "page": pidx,
-                        "x": float(w["x0"]), "y": float(w["top"]),
-                        "w": float(w["x1"] - w["x0"]), "h": float(w["bottom"] - w["top"]),
-                        "text": norm(w["text"])
-                    })
-    except Exception:
-        pass
-    return toks, "pdfplumber"
-
-def tokens_pymupdf(pdf_path):
-    if not fitz: return [], "pymupdf"
-    toks = []
-    try:
-        with fitz.open(pdf_path) as doc:
-            for pidx, page in enumerate(doc):
-                for b in page.get_text("words") or []:
-                    toks.append({
-                        "page": pidx,
-                        "x": float(b[0]), "y": float(b[1]),
-                        "w": float(b[2]-b[0]), "h": float(b[3]-b[1]),
-                        "text": norm(b[4])
-                    })
-    except Exception:
-        pass
-    return toks, "pymupdf"
-
-def tokens_ocr(pdf_path):
-    if not (convert_from_path and pytesseract): return [], "ocr"
-    toks = []
-    try:
-        images = convert_from_path(pdf_path, dpi=OCR_DPI, poppler_path=POPPLER_PATH)
-    except Exception:
-        return [], "ocr"
-    for pidx, img in enumerate(images):
-        try:
-            data = pytesseract.image_to_data(img, lang="spa+eng", output_type=pytesseract.Output.DICT,
-                                             config="--psm 6 --oem 3")
-        except Exception:
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT,
-                                             config="--psm 6 --oem 3")
-        n = len(data["text"])
-        for i in range(n):
-            txt = norm(data["text"][i])
-            if not txt: continue
-            x = float(data["left"][i]); y = float(data["top"][i])
-            w = float(data["width"][i]); h = float(data["height"][i])
-            toks.append({"page": pidx, "x": x, "y": y, "w": w, "h": h, "text": txt})
-    return toks, "ocr"
-
-def get_tokens(pdf_path):
-    toks, src = tokens_pdfplumber(pdf_path)
-    if len(toks) < MIN_TOKENS_THRESHOLD:
-        toks2, src2 = tokens_pymupdf(pdf_path)
-        if len(toks2) > len(toks): toks, src = toks2, src2
-    if len(toks) < MIN_TOKENS_THRESHOLD:
-        toks3, src3 = tokens_ocr(pdf_path)
-        if len(toks3) > len(toks): toks, src = toks3, src3
-    return toks, src
-
 # === Agrupación por filas y columnas ===
+LAYOUT_NP_MIN_TOKENS = 250  # por debajo, el loop en Python es más rápido que numpy (bench_layout)
 def group_lines(tokens, y_tol=5.0):
+    """Agrupa en filas -> [(page, y, [Token...])], ordenadas por (page, y) y cada
+    fila por x. Una fila arranca cuando cambia la página o el token se aleja más
+    de y_tol del promedio móvil de la fila. Con numpy usa group_lines_np."""
+    table = TokenTable.coerce(tokens)
+    if np and len(table) >= LAYOUT_NP_MIN_TOKENS:
+        return group_lines_np(table, y_tol)
+    page, ys, xs = table.page, table.y, table.x
     lines = []
-    tokens_sorted = sorted(tokens, key=lambda t: (t["page"], t["y"], t["x"]))
     current = []; cur_page = None; cur_y = None
-    for t in tokens_sorted:
+
+    def close():
+        current.sort(key=xs.__getitem__)
+        lines.append((cur_page, cur_y, table.views(current)))
+
+    for i in table.sort_order():
+        p, y = page[i], ys[i]
         if cur_page is None:
-            cur_page, cur_y = t["page"], t["y"]
-            current = [t]; continue
-        if t["page"] != cur_page or abs(t["y"] - cur_y) > y_tol:
-            lines.append((cur_page, cur_y, sorted(current, key=lambda z: z["x"])))
-            cur_page, cur_y, current = t["page"], t["y"], [t]
+            cur_page, cur_y = p, y
+            current = [i]; continue
+        if p != cur_page or abs(y - cur_y) > y_tol:
+            close()
+            cur_page, cur_y, current = p, y, [i]
         else:
-            cur_y = (cur_y + t["y"]) / 2
-            current.append(t)
+            cur_y = (cur_y + y) / 2
+            current.append(i)
     if current:
-        lines.append((cur_page, cur_y, sorted(current, key=lambda z: z["x"])))
+        close()
     return lines
 
-def detect_columns(all_lines):
-    xs = []
-    for _, _, toks in all_lines:
-        for i in range(1, len(toks)):
-            gap = toks[i]["x"] - (toks[i-1]["x"] + toks[i-1]["w"])
-            if gap > 12: xs.append(toks[i]["x"])
-    if not xs: return []
-    xs_sorted = sorted(xs)
-    cols = [xs_sorted[0]]
-    for x in xs_sorted[1:]:
-        if abs(x - cols[-1]) > 25:
-            cols.append(x)
+def group_lines_np(table, y_tol=5.0):
+    """Misma salida que el loop de group_lines, vectorizada con numpy.
+
+    Con los tokens ordenados por (page, y), un salto de y mayor a y_tol entre
+    vecinos siempre corta fila (el promedio móvil nunca supera al y anterior).
+    Los tramos entre cortos cuyo alto total no pasa y_tol son una sola fila; sólo
+    los tramos más altos (filas "en escalera") se resuelven con el loop original.
+    """
+    n = len(table)
+    if not n:
+        return []
+    pages, ys, xs = (np.frombuffer(table.page, dtype=np.int32), np.frombuffer(table.y, dtype=np.float64),
+                     np.frombuffer(table.x, dtype=np.float64))
+    order = np.lexsort((xs, ys, pages))   # = table.sort_order(), sin pasar por una lista
+    pages, ys, xs = pages[order], ys[order], xs[order]
+
+    brk = np.ones(n, dtype=bool)
+    brk[1:] = (pages[1:] != pages[:-1]) | ((ys[1:] - ys[:-1]) > y_tol)
+    starts = np.flatnonzero(brk)
+    ends = np.append(starts[1:], n)
+
+    tall = np.flatnonzero((ys[ends - 1] - ys[starts]) > y_tol)
+    if len(tall):
+        ys_list = ys.tolist()
+        for k in tall.tolist():
+            cur_y = ys_list[starts[k]]
+            for j in range(starts[k] + 1, ends[k]):
+                if abs(ys_list[j] - cur_y) > y_tol:
+                    brk[j] = True
+                    cur_y = ys_list[j]
+                else:
+                    cur_y = (cur_y + ys_list[j]) / 2
+        starts = np.flatnonzero(brk)
+        ends = np.append(starts[1:], n)
+
+    # orden final: por fila y dentro de la fila por x (lexsort es estable)
+    line_id = np.cumsum(brk) - 1
+    final = order[np.lexsort((xs, line_id))]
+
+    table_idx = final.tolist()
+    lines = []
+    for st, en, p, row_y in zip(starts.tolist(), ends.tolist(), pages[starts].tolist(),
+                                _row_running_y(ys, starts, ends).tolist()):
+        lines.append((p, row_y, table.views(table_idx[st:en])))
+    return lines
+
+ROW_Y_LOOP_ROWS = 8  # cuando quedan tan pocas filas largas, termina el loop en Python
+
+def _row_running_y(ys, starts, ends):
+    """y de cada fila: el mismo promedio móvil del loop (cur_y = (cur_y + y) / 2
+    token a token, en el mismo orden, así da los mismos floats), calculado por
+    posición dentro de la fila para todas las filas a la vez. Las filas van de
+    la más larga a la más corta, así las que siguen activas son un prefijo."""
+    lens = ends - starts
+    by_len = np.argsort(-lens, kind="stable")
+    first = starts[by_len]
+    neg_lens = -lens[by_len]          # creciente: searchsorted cuenta las filas activas
+    cur = ys[first]
+    k, active = 1, len(first)
+    while active > ROW_Y_LOOP_ROWS:
+        active = int(np.searchsorted(neg_lens, -k, side="left"))   # filas con más de k tokens
+        cur[:active] = (cur[:active] + ys[first[:active] + k]) / 2
+        k += 1
+    ys_list = ys.tolist()
+    for r in range(min(active, len(first))):
+        cur_y = float(cur[r])
+        for j in range(int(first[r]) + k, int(first[r] - neg_lens[r])):
+            cur_y = (cur_y + ys_list[j]) / 2
+        cur[r] = cur_y
+    out = np.empty(len(first))
+    out[by_len] = cur
+    return out
+
+def detect_columns(all_lines, min_gap=12, col_tol=25):
+    """x de inicio de cada columna: se juntan los x de los tokens que arrancan
+    después de un hueco > min_gap y se agrupan desde el menor, abriendo columna
+    nueva cuando un x se aleja más de col_tol del inicio de la columna actual."""
+    xs = None
+    if np:
+        xs = _gap_starts_np(all_lines, min_gap)
+    if xs is None:
+        xs = []
+        for _, _, toks in all_lines:
+            for i in range(1, len(toks)):
+                gap = toks[i]["x"] - (toks[i-1]["x"] + toks[i-1]["w"])
+                if gap > min_gap: xs.append(toks[i]["x"])
+        xs = sorted(xs)
+    if not len(xs): return []
+    if not np:
+        cols = [xs[0]]
+        for x in xs[1:]:
+            if abs(x - cols[-1]) > col_tol:
+                cols.append(x)
+        return cols
+    # saltos con searchsorted: una búsqueda por columna en vez de una por token.
+    # xs[k] + col_tol redondea distinto que x - xs[k] > col_tol (lo que compara el
+    # loop), así que el corte se corrige mirando los vecinos con esa misma cuenta.
+    cols = []
+    k, n = 0, len(xs)
+    while k < n:
+        c = xs[k]
+        cols.append(float(c))
+        j = int(np.searchsorted(xs, c + col_tol, side="right"))
+        while j > k + 1 and xs[j - 1] - c > col_tol:
+            j -= 1
+        while j < n and not (xs[j] - c > col_tol):
+            j += 1
+        k = j
     return cols
 
+def _gap_starts_np(all_lines, min_gap):
+    """x ordenados de los tokens precedidos por un hueco > min_gap, o None si las
+    filas no son vistas de una misma TokenTable."""
+    table = None
+    idx, lens = [], []
+    for _, _, toks in all_lines:
+        if not toks or not isinstance(toks[0], Token):
+            return None
+        tables, ix = zip(*toks)  # cada Token es (table, i)
+        if table is None:
+            table = tables[0]
+        if tables.count(table) != len(tables):
+            return None
+        idx.extend(ix)
+        lens.append(len(toks))
+    if table is None:
+        return np.empty(0)
+    idx = np.asarray(idx, dtype=np.int64)
+    x = np.frombuffer(table.x, dtype=np.float64)[idx]
+    w = np.frombuffer(table.w, dtype=np.float64)[idx]
+    gap = x[1:] - (x[:-1] + w[:-1])
+    first = np.zeros(len(idx), dtype=bool)
+    first[np.cumsum(lens)[:-1]] = True   # inicio de cada fila: sin token previo
+    keep = (gap > min_gap) & ~first[1:]
+    return np.sort(x[1:][keep])
+
 def tokens_to_fields(toks_line):
     if not toks_line: 
         return None
@@ -236,22 +508,23 @@ def tokens_to_fields(toks_line):
     toks_line = join_time_tokens(toks_line)
     texts = [t["text"] for t in toks_line if t["text"]]
 
-    nums = [i for i, s in enumerate(texts) if re.fullmatch(r"\d+", s)]
-    if len(nums) < 2:
+    # una sola clasificación por token; de ahí salen pos/nro, tiempos y vueltas
+    classes = [classify_token(s) for s in texts]
+    ints, times = [], []
+    for i, c in enumerate(classes):
+        if c & TK_INT: ints.append(i)
+        if c & TK_TIME: times.append(i)
+
+    if len(ints) < 2:
         return None
-    i_pos, i_num = nums[0], nums[1]
+    i_pos, i_num = ints[0], ints[1]
 
-    time_idx = [i for i, s in enumerate(texts) if is_time_token(s)]
-    if not time_idx:
+    if not times:
         return None
-    i_rec_time = time_idx[0]
-    i_tf = time_idx[1] if len(time_idx) > 1 else time_idx[0]
+    i_rec_time = times[0]
+    i_tf = times[1] if len(times) > 1 else times[0]
 
-    i_laps = None
-    for i in range(len(texts) - 1, -1, -1):
-        if re.fullmatch(r"\d+", texts[i]) and i > i_tf:
-            i_laps = i
-            break
+    i_laps = ints[-1] if ints[-1] > i_tf else None
     if i_laps is None:
         return None
 
@@ -259,13 +532,13 @@ def tokens_to_fields(toks_line):
     penalty_count = None
     note = None
 
-    mid_tokens = texts[i_tf + 1:i_laps]
-    for tok in mid_tokens:
+    for i in range(i_tf + 1, i_laps):
+        tok, c = texts[i], classes[i]
         if tok == ".":
             rec_secs = 0.0
-        elif re.fullmatch(r"N/L|-", tok, flags=re.IGNORECASE):
+        elif c & TK_NO_LAP:
             rec_secs = 0.0 if rec_secs is None else rec_secs
-        elif re.fullmatch(r"\d+[.,]?\d*", tok):
+        elif c & TK_NUM:
             val = float(tok.replace(",", "."))
             if "." in tok or val <= 10:
                 if rec_secs is None:
@@ -302,9 +575,9 @@ def tokens_to_fields(toks_line):
 # === Parse completo por archivo ===
 def parse_tokens_to_results(tokens):
     if not tokens: return []
+    return parse_lines_to_results(group_lines(tokens, y_tol=6.0))
 
-    lines = group_lines(tokens, y_tol=6.0)
-
+def parse_lines_to_results(lines):
     start_idx = 0
     for i, (_, _, toks) in enumerate(lines):
         low = " ".join(t["text"].lower() for t in toks)
@@ -320,15 +593,51 @@ def parse_tokens_to_results(tokens):
         if row:
             results.append(row)
 
+    return add_time_fields(results)
+
+def _secs(x):
+    return None if x is None else round(x, 3)
+
+def add_time_fields(results):
+    """Agrega a cada fila los tiempos ya en segundos, para no re-parsear strings
+    en la web: rec_s / t_final_s (de rec_str / t_final), gap_leader_s y
+    gap_prev_s (sobre t_final, sólo entre autos con las mismas vueltas; si no,
+    None) y avg_lap_s (t_final / vueltas). Las planillas no traen tiempos por
+    vuelta, así que no hay mejor vuelta real: avg_lap_s es lo más cercano."""
+    leader = prev = None
+    for row in results:
+        rec_s = time_to_seconds(row["rec_str"])
+        tf_s = time_to_seconds(row["t_final"])
+        row["rec_s"] = _secs(rec_s)
+        row["t_final_s"] = _secs(tf_s)
+        if leader is None and tf_s is not None:
+            leader = row
+        same_laps = lambda other: (other is not None and other["t_final_s"] is not None
+                                   and tf_s is not None and other["laps"] == row["laps"])
+        row["gap_leader_s"] = _secs(tf_s - leader["t_final_s"]) if same_laps(leader) else None
+        row["gap_prev_s"] = _secs(tf_s - prev["t_final_s"]) if same_laps(prev) else None
+        row["avg_lap_s"] = _secs(tf_s / row["laps"]) if tf_s is not None and row["laps"] else None
+        prev = row
     return results
 
+def to_columnar(data):
+    """Variante compacta de una carrera: un array por campo en vez de un objeto
+    por fila ({"results": {"position": [...], "name": [...], ...}})."""
+    rows = data.get("results", [])
+    fields = list(rows[0].keys()) if rows else []
+    return {"date": data.get("date"), "time": data.get("time"), "count": len(rows),
+            "results": {f: [r.get(f) for r in rows] for f in fields}}
+
+RE_META_FECHA = re.compile(r"(?:Fecha|FECHA)\s*[: ]\s*(\d{1,2}/\d{1,2}/\d{4})")
+RE_META_HORA = re.compile(r"(?:Hora|HORA)\s*[: ]\s*(\d{1,2}:\d{2})")
+
 def extract_meta(tokens):
     fecha = None; hora = None
     for t in tokens[:200]:
         s = t["text"]
-        m_f = re.search(r"(?:Fecha|FECHA)\s*[: ]\s*(\d{1,2}/\d{1,2}/\d{4})", s)
+        m_f = RE_META_FECHA.search(s)
         if m_f: fecha = m_f.group(1)
-        m_h = re.search(r"(?:Hora|HORA)\s*[: ]\s*(\d{1,2}:\d{2})", s)
+        m_h = RE_META_HORA.search(s)
         if m_h: hora = m_h.group(1)
     return fecha, hora
 
@@ -345,117 +654,973 @@ def detect_race_type(filename):
             return f"{key}{n}" if n else key
     return "unknown"
 
-def process_pdf(pdf_path):
-    tokens, extractor = get_tokens(pdf_path)
-    fecha, hora = extract_meta(tokens)
-    results = parse_tokens_to_results(tokens)
-
-    dbg = Path(pdf_path).name + ".debug.json"
-    with open(os.path.join(DEBUG_DIR, dbg), "w", encoding="utf-8") as f:
-        json.dump({
-            "extractor": extractor,
-            "tokens": len(tokens),
-            "parsed_rows": len(results)
-        }, f, ensure_ascii=False, indent=2)
-
-    if not results:
-        print(f"Omitiendo {Path(pdf_path).name}: sin datos (extractor={extractor}, tokens={len(tokens)})")
-        return None
+# === Telemetría por PDF y reporte de la corrida ===
+RUN_REPORT = "run_report.json"   # .telemetria/run_report.json
+RUN_REPORT_TOP = 10
+
+@dataclass
+class PdfResult:
+    """Todo lo que sale de procesar un PDF. data es None si no hubo filas; en ese
+    caso reason dice por qué, y tokens/lines quedan para el preview de _debug.
+    unreadable: no se pudo abrir o leer el archivo (se reintenta en la próxima corrida)."""
+    pdf_path: str
+    extractor: str = ""
+    tokens: TokenTable = field(default_factory=TokenTable)
+    lines: list = field(default_factory=list)
+    data: Optional[dict] = None
+    reason: Optional[str] = None
+    cached: bool = False
+    unreadable: bool = False
+    telemetry: Telemetry = field(default_factory=Telemetry)
+
+    @property
+    def name(self):
+        return Path(self.pdf_path).name
+
+    def debug_info(self):
+        """Lo que va a _debug/<pdf>.debug.json: sólo lo que depende del PDF, así
+        que una corrida sin cambios no lo reescribe (los tiempos van al RunReport)."""
+        info = {
+            "extractor": self.extractor,
+            "tokens": len(self.tokens),
+            "parsed_rows": len(self.data["results"]) if self.data else 0
+        }
+        if self.reason:
+            info["reason"] = self.reason
+        return info
 
-    return {"date": fecha, "time": hora, "results": results}
+class RunReport:
+    """Junta la telemetría de cada PDF de la corrida y la escribe en
+    .telemetria/run_report.json: totales por etapa, fallbacks, páginas de OCR y los
+    PDFs más lentos (en total y en OCR)."""
+
+    def __init__(self):
+        self.started = datetime.now(timezone.utc)
+        self.t0 = time.perf_counter()
+        self.files = []
+
+    def add(self, res: PdfResult, fecha_dir=None, race=None):
+        entry = {"pdf": os.path.join(fecha_dir, res.name) if fecha_dir else res.name,
+                 "race": race, **res.debug_info(), "cached": res.cached,
+                 "telemetry": res.telemetry.to_dict()}
+        self.files.append(entry)
+        return entry
+
+    def to_dict(self):
+        stages = {}
+        for f in self.files:
+            for name, st in f["telemetry"]["stages"].items():
+                tot = stages.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "files": 0})
+                tot["wall_ms"] = round(tot["wall_ms"] + st["wall_ms"], 3)
+                tot["cpu_ms"] = round(tot["cpu_ms"] + st["cpu_ms"], 3)
+                tot["files"] += 1
+
+        def ranking(key):
+            ranked = sorted(((key(f), f["pdf"]) for f in self.files), reverse=True)
+            return [{"pdf": pdf, "wall_ms": ms} for ms, pdf in ranked[:RUN_REPORT_TOP] if ms]
+
+        fallbacks = [{"pdf": f["pdf"], **fb} for f in self.files for fb in f["telemetry"]["fallbacks"]]
+        return {
+            "started_utc": self.started.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "wall_s": round(time.perf_counter() - self.t0, 3),
+            "files": len(self.files),
+            "cached": sum(f["cached"] for f in self.files),
+            "without_rows": sum(not f["parsed_rows"] for f in self.files),
+            "ocr_files": sum(bool(f["telemetry"]["ocr_pages"]) for f in self.files),
+            "ocr_pages": sum(len(f["telemetry"]["ocr_pages"]) for f in self.files),
+            "stages": stages,
+            "fallbacks": fallbacks,
+            "slowest": ranking(lambda f: f["telemetry"]["wall_ms"]),
+            "slowest_ocr": ranking(lambda f: f["telemetry"]["stages"].get("extract:ocr", {}).get("wall_ms", 0)),
+            "per_file": self.files,
+        }
+
+    def write(self):
+        save_json(os.path.join(TELEMETRY_DIR, RUN_REPORT), self.to_dict())
+
+def write_debug_preview(result: PdfResult, writer, max_lines=80):
+    """Preview de texto rápido (sin re-extraer) por si querés inspeccionar.
+    Va por `writer` como el resto de resultados/ (_debug también se sube)."""
+    txt_out = os.path.join(DEBUG_DIR, result.name + ".txt")
+    text = "[preview]\n" + "".join(" ".join(t["text"] for t in toks) + "\n"
+                                   for _, _, toks in result.lines[:max_lines])
+    writer.write_bytes(txt_out, text.encode("utf-8"))
+
+def extract_and_parse(src, res: PdfResult, entry, digest):
+    """Tokens, filas y metadatos desde la entrada de caché o, si no hay, desde el
+    PdfSource ya abierto (y los guarda en caché). Devuelve (fecha, hora, results)."""
+    tel = res.telemetry
+    if entry:
+        res.tokens = TokenTable.from_columns(entry["tokens"])
+        res.extractor, res.cached = entry["extractor"], True
+        if not entry["results"]:
+            with tel.stage("group_lines"):
+                res.lines = group_lines(res.tokens, y_tol=6.0)
+        return entry["date"], entry["time"], entry["results"]
+
+    res.tokens, res.extractor = get_tokens(src, tel)
+    with tel.stage("group_lines"):
+        fecha, hora = extract_meta(res.tokens)
+        res.lines = group_lines(res.tokens, y_tol=6.0) if res.tokens else []
+    with tel.stage("parse"):
+        results = parse_lines_to_results(res.lines)
+    if digest:
+        try:
+            with tel.stage("cache_store"):
+                cache_put(digest, {
+                    "source": res.name, "extractor": res.extractor, "extractors": extractor_order(),
+                    "tokens": res.tokens.to_columns(), "date": fecha, "time": hora, "results": results
+                })
+        except OSError as e:
+            print(f"Aviso: no pude guardar caché de {res.name} ({e})")
+    return fecha, hora, results
+
+def process_pdf(pdf_path, use_cache=True, force=False, name=None) -> PdfResult:
+    """Extrae y parsea un PDF. El archivo se mapea una sola vez (PdfSource) y de
+    ahí salen el hash y todos los extractores. Con caché, un PDF sin cambios (mismo
+    hash, PARSER_VERSION y orden de extractores) no se vuelve a parsear.
+    force=True re-extrae y pisa la entrada.
+    pdf_path también puede ser bytes o un archivo abierto (ver PdfSource); name es
+    el nombre con el que figura en el resultado (por defecto, el de la ruta).
+    El _debug/<pdf>.debug.json lo escribe store_result."""
+    res = PdfResult(name or (os.fspath(pdf_path) if isinstance(pdf_path, (str, os.PathLike)) else "<memoria>"))
+    tel = res.telemetry
+    try:
+        with PdfSource(pdf_path) as src:
+            with tel.stage("cache_lookup"):
+                digest = src.sha256() if use_cache else None
+                entry = cache_get(digest) if (digest and not force) else None
+                if entry and entry.get("extractors", ["pdfplumber", "pymupdf"]) != extractor_order():
+                    entry = None  # se extrajo con otro orden (--pymupdf-first)
+            fecha, hora, results = extract_and_parse(src, res, entry, digest)
+    except OSError as e:
+        # borrado, movido o todavía abierto por el software de cronometraje: se sigue con el resto
+        res.reason, res.unreadable = f"no se pudo leer ({e.strerror or e})", True
+        print(f"Omitiendo {res.name}: {res.reason}")
+        return res
+
+    if results:
+        res.data = {"date": fecha, "time": hora, "results": results}
+    else:
+        res.reason = "sin tokens" if not res.tokens else "sin filas reconocibles"
+
+    if not res.data:
+        print(f"Omitiendo {res.name}: {res.reason} (extractor={res.extractor}, tokens={len(res.tokens)})")
+
+    return res
 
 # === Reconstrucción/limpieza total de manifiestos según el disco ===
-def rebuild_manifests_from_disk():
+def rebuild_manifests_from_disk(writer=None):
+    """Deja fechas.json e index.json iguales a lo que hay en disco (refleja
+    borrados/movidas). Cada manifiesto se escribe a lo sumo una vez."""
     print("[SYNC] Reconstruyendo manifiestos desde resultados/ ...")
-    fechas_validas = []
+    fechas_validas = ManifestBuilder().scan_disk().write(merge=False, writer=writer)
+    print(f"[SYNC] fechas.json actualizado. Fechas: {fechas_validas}")
 
-    # Buscar subcarpetas tipo 'Fecha NN'
-    for nombre in os.listdir(OUTPUT_DIR):
-        fecha_dir = os.path.join(OUTPUT_DIR, nombre)
-        if not (os.path.isdir(fecha_dir) and re.match(r"^Fecha\s*\d+$", nombre, re.IGNORECASE)):
-            continue
+# === Índice por piloto y por número de auto ===
+DRIVERS_INDEX = "pilotos.json"   # resultados/pilotos.json: {clave_nombre: {...}}
+NUMBERS_INDEX = "numeros.json"   # resultados/numeros.json: {"46": [...]}
 
-        # carreras presentes (por archivo existente)
-        races = []
-        for fn in os.listdir(fecha_dir):
-            if not fn.lower().endswith(".json"):
-                continue
-            if fn.lower() == "index.json":
-                continue
-            base = os.path.splitext(fn)[0].lower()
-            # aceptar nombres válidos
-            if re.match(r"^(serie\d+|repechaje\d+|semifinal\d+|prefinal|final)$", base):
-                races.append(base)
+def normalize_name(name: str) -> str:
+    """Clave para juntar variantes de un mismo piloto: sin acentos, mayúsculas,
+    sin puntuación y con espacios simples ("Dupont  Braián" -> "DUPONT BRAIAN")."""
+    s = unicodedata.normalize("NFKD", name or "")
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    s = re.sub(r"[^\w\s]", " ", s.upper())
+    return norm(s)
+
+def _entry_sort_key(e):
+    return (fecha_sort_key(e["fecha"]), e["fecha"], race_sort_key(e["race"]), e.get("position") or 0,
+            e.get("number") or 0, e.get("name") or "")
+
+def build_driver_index(writer, force=False):
+    """Actualiza pilotos.json y numeros.json con (fecha, race, position,
+    t_final, laps) de cada resultado. Sólo se releen las carreras que cambiaron
+    en esta corrida (según writer.changed); si falta algún índice o force=True,
+    se arma desde todas las carreras de los manifiestos."""
+    drivers_path = os.path.join(OUTPUT_DIR, DRIVERS_INDEX)
+    numbers_path = os.path.join(OUTPUT_DIR, NUMBERS_INDEX)
+    fechas = load_json(os.path.join(OUTPUT_DIR, "fechas.json"), {"fechas": []}).get("fechas", [])
+    valid = {(f, r) for f in fechas
+             for r in load_json(os.path.join(OUTPUT_DIR, f, "index.json"), {"races": []}).get("races", [])}
+
+    full = force or not (os.path.exists(drivers_path) and os.path.exists(numbers_path))
+    if full:
+        entries = []
+        dirty = valid
+    else:
+        # carreras tocadas en esta corrida (escritas o borradas) + las que ya no están en los manifiestos
+        dirty = set()
+        for path in writer.changed:
+            fecha = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            race = os.path.splitext(os.path.basename(path))[0].lower()
+            if RE_RACE_FILE.match(race) and path.lower().endswith(".json"):
+                dirty.add((fecha, race))
+        entries = [dict(e, key=key) for key, d in load_json(drivers_path, {}).get("pilotos", {}).items()
+                   for e in d.get("resultados", [])]
+        dirty |= {(e["fecha"], e["race"]) for e in entries} - valid
+        if not dirty:
+            return
+        entries = [e for e in entries if (e["fecha"], e["race"]) not in dirty]
+
+    for fecha, race in sorted(dirty & valid):
+        data = load_json(os.path.join(OUTPUT_DIR, fecha, f"{race}.json"), None) or {}
+        for r in data.get("results", []):
+            entries.append({"key": normalize_name(r.get("name")), "name": r.get("name"),
+                            "fecha": fecha, "race": race, "position": r.get("position"),
+                            "number": r.get("number"), "t_final": r.get("t_final"), "laps": r.get("laps")})
+    entries.sort(key=_entry_sort_key)
+
+    drivers, numbers = {}, {}
+    for e in entries:
+        key = e.pop("key")
+        d = drivers.setdefault(key, {"name": e["name"], "variants": [], "numbers": [], "resultados": []})
+        d["name"] = e["name"]   # se muestra la variante más reciente
+        if e["name"] not in d["variants"]: d["variants"].append(e["name"])
+        if e["number"] not in d["numbers"]: d["numbers"].append(e["number"])
+        d["resultados"].append(e)
+        numbers.setdefault(str(e["number"]), []).append(
+            {k: e[k] for k in ("fecha", "race", "position", "name", "t_final", "laps")})
 
-        races = sorted(set(races), key=race_sort_key)
+    writer.write_json(drivers_path, {"pilotos": dict(sorted(drivers.items()))})
+    writer.write_json(numbers_path, {"numeros": dict(sorted(numbers.items(), key=lambda kv: int(kv[0]) if kv[0].isdigit() else 1 << 30))})
 
-        index_path = os.path.join(fecha_dir, "index.json")
-        if races:
-            save_json(index_path, {"races": races})
-            fechas_validas.append(nombre)
+# === Bundles agregados (menos requests para la web) ===
+FECHA_BUNDLE = "bundle.json"       # resultados/<Fecha N>/bundle.json: todas las carreras
+SEASON_BUNDLE = "temporada.json"   # resultados/temporada.json: todas las fechas
+
+def build_standings(writer, force=False):
+    """Posiciones provisorias del campeonato (campeonato.py). Se importa recién
+    acá porque campeonato importa este módulo."""
+    import campeonato
+    try:
+        return campeonato.build_standings(writer, force=force)
+    except ValueError as e:   # puntos.json mal formado: no frena el resto
+        print(f"[CAMPEONATO] {e}")
+        return None
+
+def dump_min_json_bytes(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def write_compressed(writer, path, payload: bytes):
+    """Escribe path y sus hermanos .gz/.br precomprimidos (si cambió el original
+    o falta alguno). gzip con mtime=0 para que el mismo JSON dé los mismos bytes."""
+    changed = writer.write_bytes(path, payload)
+    if changed or not os.path.exists(path + ".gz"):
+        writer.write_bytes(path + ".gz", gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli and (changed or not os.path.exists(path + ".br")):
+        writer.write_bytes(path + ".br", brotli.compress(payload, quality=11))
+    return changed
+
+def build_bundles(writer, force=False):
+    """Arma bundle.json por fecha y temporada.json, minificados y con .gz/.br.
+    Una fecha se rearma sólo si en esta corrida cambió alguna de sus carreras
+    o su index.json (según writer.changed), o si falta su bundle; temporada.json
+    sólo si cambió algún bundle o fechas.json. Los JSON por carrera no se tocan."""
+    changed_dirs = {os.path.dirname(os.path.abspath(p)) for p in writer.changed}
+    fechas_path = os.path.join(OUTPUT_DIR, "fechas.json")
+    fechas = load_json(fechas_path, {"fechas": []}).get("fechas", [])
+    season_dirty = force or os.path.abspath(fechas_path) in {os.path.abspath(p) for p in writer.changed}
+    bundles = {}
+    for fecha in fechas:
+        fecha_dir = os.path.join(OUTPUT_DIR, fecha)
+        bundle_path = os.path.join(fecha_dir, FECHA_BUNDLE)
+        if force or os.path.abspath(fecha_dir) in changed_dirs or not os.path.exists(bundle_path):
+            races = load_json(os.path.join(fecha_dir, "index.json"), {"races": []}).get("races", [])
+            bundle = {"fecha": fecha, "races": races,
+                      "results": {r: load_json(os.path.join(fecha_dir, f"{r}.json"), None) for r in races}}
+            season_dirty |= write_compressed(writer, bundle_path, dump_min_json_bytes(bundle))
         else:
-            # si no tiene carreras, eliminar index vacío (si existiera)
-            if os.path.exists(index_path):
-                try:
-                    os.remove(index_path)
-                except Exception:
-                    pass
+            bundle = load_json(bundle_path, None)
+        bundles[fecha] = bundle
 
-    # escribir fechas.json solo con fechas que tengan al menos 1 carrera
-    fechas_validas.sort(key=lambda s: int(re.search(r"\d+", s).group()))
-    save_json(os.path.join(OUTPUT_DIR, "fechas.json"), {"fechas": fechas_validas})
-    print(f"[SYNC] fechas.json actualizado. Fechas: {fechas_validas}")
+    season_path = os.path.join(OUTPUT_DIR, SEASON_BUNDLE)
+    if season_dirty or not os.path.exists(season_path):
+        season = {"fechas": fechas, "bundles": bundles}
+        write_compressed(writer, season_path, dump_min_json_bytes(season))
+
+def list_pdf_jobs():
+    """Lista (fecha_dir, pdf_file, pdf_path) en orden determinístico."""
+    return [(fecha_dir, pdf_file, pdf_path) for fecha_dir, pdf_file, pdf_path, _ in escaneo.iter_pdf_files(PDF_DIR)]
+
+def store_result(fecha_dir, pdf_file, res: PdfResult, writer, builder, columnar=False, report=None):
+    """Guarda el JSON de la carrera (o el preview de _debug si no hubo datos) y la
+    anota en el ManifestBuilder. Con columnar también escribe <race>.cols.json
+    (ver to_columnar). Después escribe el .debug.json (también por writer) y, si se pasa report
+    (RunReport), le suma la telemetría. Devuelve el nombre de la carrera o None."""
+    out_dir = os.path.join(OUTPUT_DIR, fecha_dir)
+    os.makedirs(out_dir, exist_ok=True)
 
-def process_pdfs():
+    race_type = None
+    with res.telemetry.stage("write"):
+        if not res.data:
+            try:
+                write_debug_preview(res, writer)
+            except Exception:
+                pass
+        else:
+            race_type = detect_race_type(pdf_file)
+            out_path = os.path.join(out_dir, f"{race_type}.json")
+            if writer.write_json(out_path, res.data):
+                print(f"JSON guardado: {out_path}")
+            if columnar:
+                writer.write_bytes(os.path.join(out_dir, f"{race_type}.cols.json"),
+                                   dump_min_json_bytes(to_columnar(res.data)))
+            builder.add(fecha_dir, race_type)
+
+    writer.write_json(os.path.join(DEBUG_DIR, res.name + ".debug.json"), res.debug_info())
+    if report is not None:
+        report.add(res, fecha_dir, race_type)
+    return race_type
+
+# Servidor de extracción (servidor_pdf.py): con --worker, cmd_extract deja acá
+# un WorkerClient y los PDFs se extraen allá, con las librerías ya cargadas.
+WORKER = None
+
+def extract_pdf(pdf_path, use_cache=True, force=False):
+    """process_pdf en el servidor de extracción si hay uno conectado; si se cae,
+    sigue en este proceso. Si el servidor falla con este PDF (WorkerError), ese
+    PDF se extrae acá y el servidor se sigue usando para los demás."""
+    global WORKER
+    if WORKER is not None:
+        import servidor_pdf   # ya importado por cmd_extract
+        try:
+            res = WORKER.process_pdf(pdf_path, use_cache=use_cache, force=force)
+            if not res.data:  # el aviso de process_pdf quedó en la consola del servidor
+                print(f"Omitiendo {res.name}: {res.reason} (extractor={res.extractor}, tokens={len(res.tokens)})")
+            return res
+        except (OSError, EOFError) as e:
+            print(f"Aviso: se perdió la conexión con el servidor de extracción ({e}); sigo acá.")
+            WORKER = None
+        except servidor_pdf.WorkerError as e:
+            print(f"Aviso: el servidor de extracción falló con {os.path.basename(pdf_path)} ({e}); lo extraigo acá.")
+    return process_pdf(pdf_path, use_cache=use_cache, force=force)
+
+def process_pdfs(use_cache=True, force=False, jobs=1, write_manifests=True, writer=None, columnar=False,
+                 pdf_jobs=None, journal=None, stats=None):
+    """Procesa todos los PDFs (o sólo pdf_jobs). Con jobs > 1 la extracción corre en un pool de
+    procesos; las escrituras de JSON y manifiestos quedan en este proceso y en
+    el mismo orden que la corrida serial.
+
+    Las carreras procesadas se juntan en un ManifestBuilder (que se devuelve) y
+    al final se suman a los manifiestos del disco en una sola escritura. Con
+    write_manifests=False no se escribe nada: sirve cuando a continuación se
+    corre rebuild_manifests_from_disk(), que igual los reescribe.
+    Las escrituras pasan por `writer` (OutputWriter) para saltear lo idéntico.
+    Al terminar deja la telemetría de todos los PDFs en .telemetria/run_report.json.
+    Con journal (escaneo.Journal) anota qué JSON salió de cada PDF; stats trae
+    (size, mtime_ns, sha256) por pdf_path si ya se calcularon al escanear."""
     if not os.path.exists(PDF_DIR):
         print(f"Error: No existe {PDF_DIR}")
         return
 
-    for fecha_dir in os.listdir(PDF_DIR):
-        fecha_path = os.path.join(PDF_DIR, fecha_dir)
-        if not (os.path.isdir(fecha_path) and fecha_dir.lower().startswith("fecha")):
-            continue
+    pdf_jobs = list_pdf_jobs() if pdf_jobs is None else pdf_jobs
+    builder = ManifestBuilder()
+    writer = writer if writer is not None else OutputWriter()
+    worker = partial(extract_pdf if WORKER else process_pdf, use_cache=use_cache, force=force)
+    paths = [pdf_path for _, _, pdf_path in pdf_jobs]
+    report = RunReport()
+
+    pool = None
+    if jobs > 1 and len(paths) > 1 and not WORKER:  # con servidor, de a uno (cmd_extract avisa)
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=min(jobs, len(paths)))
+        outputs = pool.map(worker, paths)
+    else:
+        outputs = map(worker, paths)
+
+    try:
+        for (fecha_dir, pdf_file, pdf_path), res in zip(pdf_jobs, outputs):
+            race = store_result(fecha_dir, pdf_file, res, writer, builder, columnar=columnar, report=report)
+            if journal is not None and not res.unreadable:
+                journal_record(journal, fecha_dir, pdf_file, pdf_path, race, (stats or {}).get(pdf_path))
+    finally:
+        if pool:
+            pool.shutdown()
+    report.write()
+    print_run_report(report)
+
+    if write_manifests:
+        builder.write(merge=True, writer=writer)
+
+    if use_cache:
+        removed = cache_evict()
+        if removed:
+            print(f"[CACHE] {removed} entradas viejas eliminadas")
+    return builder
+
+def print_run_report(report: RunReport, top=3):
+    data = report.to_dict()
+    if not data["files"]:
+        return
+    print(f"[TIEMPOS] {data['files']} PDFs en {data['wall_s']:.2f}s "
+          f"({data['cached']} desde caché, {data['ocr_files']} con OCR / {data['ocr_pages']} páginas)")
+    for f in data["slowest"][:top]:
+        print(f"[TIEMPOS]   {f['pdf']}: {f['wall_ms'] / 1000:.2f}s")
+
+# === API para usar el parser como librería ===
+# for fecha, race, data in iter_results(fuentes, sinks=[MemorySink()]): ...
+# Las fuentes pueden venir de un upload (bytes / archivo) sin pasar por pdfs/, y no
+# se escribe nada en disco salvo que se use un DiskSink (o use_cache=True).
+def _source_info(source):
+    """(fecha, nombre_pdf, pdf) para cada forma de fuente que acepta iter_results."""
+    if isinstance(source, tuple):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        return path.parent.name or None, path.name, source
+    name = getattr(source, "name", None)   # archivo abierto
+    if isinstance(name, str):
+        return Path(name).parent.name or None, Path(name).name, source
+    return None, None, source
+
+def iter_results(sources, sinks=(), use_cache=False, force=False):
+    """Procesa cada fuente y va devolviendo (fecha, race, data) a medida que sale.
+
+    Una fuente es una ruta, bytes, un archivo abierto en binario o una tupla
+    (fecha, nombre_pdf, pdf) cuando fecha y nombre no salen de la ruta (p.ej. un
+    upload). race sale del nombre (detect_race_type) y data es el dict de la
+    carrera, o None si no hubo filas. Cada carrera con datos también se pasa a
+    cada sink (sink.add(fecha, race, data)); al terminar se llama sink.close()."""
+    try:
+        for source in sources:
+            fecha, name, pdf = _source_info(source)
+            res = process_pdf(pdf, use_cache=use_cache, force=force, name=name)
+            race = detect_race_type(name) if name else "unknown"
+            if res.data:
+                for sink in sinks:
+                    sink.add(fecha, race, res.data)
+            yield fecha, race, res.data
+    finally:
+        for sink in sinks:
+            sink.close()
+
+class MemorySink:
+    """Deja las carreras en memoria: races[(fecha, race)] = data."""
+
+    def __init__(self):
+        self.races = {}
+
+    def add(self, fecha, race, data):
+        self.races[(fecha, race)] = data
+
+    def close(self):
+        pass
+
+class DiskSink:
+    """Escribe <output_dir>/<fecha>/<race>.json (salteando lo idéntico) y al cerrar
+    suma las carreras a index.json y fechas.json, como la corrida normal."""
+
+    def __init__(self, output_dir=None, writer=None, columnar=False):
+        self.output_dir = output_dir or OUTPUT_DIR
+        self.writer = writer if writer is not None else OutputWriter()
+        self.builder = ManifestBuilder(self.output_dir)
+        self.columnar = columnar
+
+    def add(self, fecha, race, data):
+        if not fecha:
+            raise ValueError(f"DiskSink necesita la fecha de {race} (usá una fuente (fecha, nombre, pdf))")
+        out_dir = os.path.join(self.output_dir, fecha)
+        self.writer.write_json(os.path.join(out_dir, f"{race}.json"), data)
+        if self.columnar:
+            self.writer.write_bytes(os.path.join(out_dir, f"{race}.cols.json"),
+                                    dump_min_json_bytes(to_columnar(data)))
+        self.builder.add(fecha, race)
+
+    def close(self):
+        if self.builder.fechas:
+            self.builder.write(merge=True, writer=self.writer)
+
+class BundleSink:
+    """Arma en memoria los bundles por fecha con el mismo formato que bundle.json
+    ({"fecha", "races", "results"}); payload() da el JSON minificado de una fecha
+    o, sin argumento, el de toda la temporada (como temporada.json)."""
+
+    def __init__(self):
+        self.bundles = {}
+
+    def add(self, fecha, race, data):
+        bundle = self.bundles.setdefault(fecha, {"fecha": fecha, "races": [], "results": {}})
+        if race not in bundle["results"]:
+            bundle["races"] = sorted(bundle["races"] + [race], key=race_sort_key)
+        bundle["results"][race] = data
+
+    def close(self):
+        pass
+
+    def payload(self, fecha=None) -> bytes:
+        if fecha is not None:
+            return dump_min_json_bytes(self.bundles[fecha])
+        fechas = sorted(self.bundles, key=lambda f: fecha_sort_key(f or ""))
+        return dump_min_json_bytes({"fechas": fechas, "bundles": {f: self.bundles[f] for f in fechas}})
+
+# === Diario de pdfs/: procesar sólo lo que cambió ===
+def journal_settings(columnar=False):
+    """Lo que cambia la salida de un PDF sin que cambie el PDF: si difiere de lo
+    anotado en el diario, se reprocesa todo. (El orden de extractores va por la
+    preferencia y no por extractor_order(), que importaría PyMuPDF.)"""
+    first = "pymupdf" if extractores.PYMUPDF_FIRST else "pdfplumber"
+    return f"parser {PARSER_VERSION}; primero {first}; columnar {int(bool(columnar))}"
+
+def race_output(fecha_dir, race):
+    """Ruta del JSON de una carrera relativa a resultados/ (como la guarda el diario)."""
+    return f"{fecha_dir}/{race}.json"
+
+def journal_record(journal, fecha_dir, pdf_file, pdf_path, race, stat=None):
+    """Anota el PDF en el diario. Si esta vez no dio filas, el JSON que ya había
+    generado queda (igual que antes) y sigue asociado a este PDF."""
+    if stat is None:
+        try:
+            st = os.stat(pdf_path)
+            stat = (st.st_size, st.st_mtime_ns, escaneo.file_sha256(pdf_path))
+        except OSError:
+            return
+    key = escaneo.journal_key(fecha_dir, pdf_file)
+    output = race_output(fecha_dir, race) if race else (journal.entries.get(key) or {}).get("output")
+    journal.record(key, *stat, output)
+
+def journal_job(key):
+    """Clave del diario -> (fecha_dir, pdf_file, pdf_path)."""
+    fecha_dir, pdf_file = key.split("/", 1)
+    return fecha_dir, pdf_file, os.path.join(PDF_DIR, fecha_dir, pdf_file)
+
+def remove_race_output(writer, builder, output):
+    """Borra resultados/<Fecha N>/<race>.json (y su .cols.json) y lo saca de los manifiestos."""
+    fecha_dir, fn = output.split("/", 1)
+    race = os.path.splitext(fn)[0]
+    path = os.path.join(OUTPUT_DIR, fecha_dir, fn)
+    if writer.remove(path):
+        print(f"JSON borrado (ya no está su PDF): {path}")
+    writer.remove(os.path.join(OUTPUT_DIR, fecha_dir, f"{race}.cols.json"))
+    builder.remove(fecha_dir, race)
 
-        pdf_files = [f for f in os.listdir(fecha_path) if f.lower().endswith(".pdf")]
-        if not pdf_files:
+def sync_pdfs(use_cache=True, force=False, jobs=1, writer=None, columnar=False, full=False,
+              journal_path=escaneo.JOURNAL_FILE):
+    """Compara pdfs/ contra el diario y procesa sólo lo nuevo o modificado; un
+    PDF renombrado sin cambiar de carrera no se vuelve a abrir, y el JSON de un
+    PDF borrado (o renombrado a otra carrera) se borra si ningún otro PDF lo
+    genera. Los manifiestos se actualizan con esos cambios, sin listar
+    resultados/. Con full=True se procesan todos los PDFs (como antes).
+
+    Varios PDFs pueden dar el mismo JSON (FINAL.PDF y FINAL TITULARES.PDF ->
+    final.json): si uno de ellos cambió, se borró o se renombró, se reprocesan
+    todos los que lo generan (salen de la caché) en el orden de la corrida
+    completa, así gana el mismo que con --full. Devuelve el ScanDiff, o None
+    si no existe PDF_DIR (en ese caso no se toca nada de resultados/)."""
+    writer = writer if writer is not None else OutputWriter()
+    journal = escaneo.Journal.load(journal_path, journal_settings(columnar))
+    try:
+        diff = journal.scan(PDF_DIR, OUTPUT_DIR)
+    except FileNotFoundError:
+        # sin pdfs/ (desmontado, movido) todo parecería borrado: no se toca nada
+        print(f"Error: No existe {PDF_DIR}")
+        return None
+    print(f"[SCAN] {diff.summary()}")
+
+    todo, orphans, contested = diff.added + diff.modified, [], set()
+    for old_key, job in diff.renamed:
+        fecha_dir, pdf_file, pdf_path = job
+        old = journal.entries[old_key]
+        journal.drop(old_key)
+        same_race = old.get("output") in (None, race_output(fecha_dir, detect_race_type(pdf_file)))
+        if same_race and fecha_dir == old_key.split("/", 1)[0]:
+            journal.record(escaneo.journal_key(fecha_dir, pdf_file), *diff.stats[pdf_path], old.get("output"))
+            contested.add(old.get("output"))   # con otro nombre puede cambiar cuál gana
+        else:
+            todo.append(job)
+            orphans.append(old.get("output"))
+    for key in diff.deleted:
+        orphans.append(journal.entries[key].get("output"))
+        journal.drop(key)
+    if full or force:
+        todo = list_pdf_jobs()
+    else:
+        contested |= set(orphans)
+        contested |= {race_output(fecha_dir, detect_race_type(pdf_file)) for fecha_dir, pdf_file, _ in todo}
+        by_output = journal.outputs()
+        todo = sorted(set(todo) | {journal_job(key) for o in contested for key in by_output.get(o, ())})
+
+    builder = ManifestBuilder()
+    if todo:
+        builder = process_pdfs(use_cache=use_cache, force=force, jobs=jobs, write_manifests=False,
+                               writer=writer, columnar=columnar, pdf_jobs=sorted(todo),
+                               journal=journal, stats=diff.stats) or builder
+    live = journal.outputs()
+    for output in sorted({o for o in orphans if o and o not in live}):
+        remove_race_output(writer, builder, output)
+    if not full:
+        builder.write(merge=True, writer=writer)
+    journal.save()
+    return diff
+
+# === Modo watch: procesar cada PDF apenas aparece ===
+def pdf_job_for(path):
+    """(fecha_dir, pdf_file, pdf_path) si path es un PDF dentro de pdfs/<Fecha N>/."""
+    path = os.path.abspath(path)
+    fecha_path, pdf_file = os.path.split(path)
+    fecha_dir = os.path.basename(fecha_path)
+    if (os.path.dirname(fecha_path) != os.path.abspath(PDF_DIR) or not pdf_file.lower().endswith(".pdf")
+            or not fecha_dir.lower().startswith("fecha")):
+        return None
+    return fecha_dir, pdf_file, os.path.join(PDF_DIR, fecha_dir, pdf_file)
+
+def pdf_signatures():
+    """{pdf_path: (size, mtime_ns)} de todos los PDFs de pdfs/<Fecha N>/."""
+    sigs = {}
+    try:
+        jobs = list_pdf_jobs()
+    except FileNotFoundError:   # pdfs/ desapareció un momento: sin novedades
+        return sigs
+    for _, _, pdf_path in jobs:
+        try:
+            st = os.stat(pdf_path)
+        except OSError:
             continue
+        sigs[pdf_path] = (st.st_size, st.st_mtime_ns)
+    return sigs
 
-        out_dir = os.path.join(OUTPUT_DIR, fecha_dir)
-        os.makedirs(out_dir, exist_ok=True)
+def process_one(pdf_path, use_cache=True, publish=None, columnar=False, report=None, journal=None):
+    """Procesa un solo PDF: su JSON, los manifiestos de esa carrera y (si se
+    pasa publish) la subida de lo que cambió. Con report (RunReport) suma su
+    telemetría y reescribe .telemetria/run_report.json; con journal lo anota en el
+    diario de pdfs/ y, si otros PDFs dan el mismo JSON, los que van después en la
+    corrida completa se vuelven a escribir encima (como en sync_pdfs)."""
+    job = pdf_job_for(pdf_path)
+    if not job:
+        return None
+    fecha_dir, pdf_file, pdf_path = job
+    writer, builder = OutputWriter(), ManifestBuilder()
+    res = extract_pdf(pdf_path, use_cache=use_cache)
+    race = store_result(fecha_dir, pdf_file, res, writer, builder, columnar=columnar, report=report)
+    if report is not None:
+        report.write()
+    if journal is not None and not res.unreadable:
+        journal_record(journal, fecha_dir, pdf_file, pdf_path, race)
+        journal.save()
+        if race:
+            later = sorted(j for j in map(journal_job, journal.outputs().get(race_output(fecha_dir, race), ()))
+                           if j > job)
+            for later_fecha, later_file, later_path in later:
+                store_result(later_fecha, later_file, extract_pdf(later_path, use_cache=use_cache),
+                             writer, builder, columnar=columnar)
+    if race:
+        builder.write(merge=True, writer=writer)
+        build_driver_index(writer)
+        build_standings(writer)
+        build_bundles(writer)
+    if publish and writer.changed:
+        publish(writer.changed)
+    return race
 
-        for pdf_file in sorted(pdf_files):
-            pdf_path = os.path.join(fecha_path, pdf_file)
-            data = process_pdf(pdf_path)
-            if not data:
-                # preview de texto rápido por si querés inspeccionar
-                txt_out = os.path.join(DEBUG_DIR, pdf_file + ".txt")
-                try:
-                    tokens, _ = get_tokens(pdf_path)
-                    lines = group_lines(tokens)
-                    with open(txt_out, "w", encoding="utf-8") as f:
-                        f.write("[preview]\n")
-                        for _, _, toks in lines[:80]:
-                            f.write(" ".join(t["text"] for t in toks) + "\n")
-                except Exception:
-                    pass
+class PdfWatcher:
+    """Junta los PDFs que cambian bajo pdfs/ y los entrega recién cuando su
+    tamaño y mtime no cambiaron durante `debounce` segundos (el sistema de
+    cronometraje puede estar escribiéndolos todavía).
+
+    Usa watchdog (inotify/ReadDirectoryChangesW) si está instalado; si no, hace
+    polling cada `interval` segundos comparando tamaño y mtime."""
+
+    def __init__(self, interval=1.0, debounce=2.0):
+        self.interval = interval
+        self.debounce = debounce
+        self.pending = {}   # pdf_path -> (firma, desde_cuando_estable)
+        self.scanned = pdf_signatures()           # última foto del polling
+        self.delivered = dict(self.scanned)       # firma con la que se entregó cada PDF
+        self.events = Queue()
+        self.observer = None
+        if WatchdogObserver:
+            self.observer = WatchdogObserver()
+            self.observer.schedule(_watchdog_handler(self.events), PDF_DIR, recursive=True)
+
+    def start(self):
+        if self.observer:
+            self.observer.start()
+        return self
+
+    def stop(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+
+    @property
+    def mode(self):
+        return "watchdog" if self.observer else f"polling cada {self.interval:g}s"
+
+    def _candidates(self):
+        if self.observer:
+            paths = set()
+            try:
+                paths.add(self.events.get(timeout=self.interval))
+                while True:
+                    paths.add(self.events.get_nowait())
+            except Empty:
+                pass
+            return {job[2] for job in map(pdf_job_for, paths) if job}
+        time.sleep(self.interval)
+        current = pdf_signatures()
+        changed = {p for p, sig in current.items() if self.scanned.get(p) != sig}
+        self.scanned = current
+        return changed
+
+    def poll(self):
+        """Espera novedades y devuelve los PDFs listos para procesar."""
+        now = time.monotonic()
+        for path in self._candidates():
+            self.pending.setdefault(path, (None, now))
+        ready = []
+        for path, (sig, since) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]   # se borró o se movió
                 continue
+            cur = (st.st_size, st.st_mtime_ns)
+            if cur != sig:
+                self.pending[path] = (cur, now)
+            elif st.st_size and now - since >= self.debounce:
+                del self.pending[path]
+                if self.delivered.get(path) != cur:   # p.ej. eventos por sólo leerlo
+                    self.delivered[path] = cur
+                    ready.append(path)
+        return sorted(ready)
 
-            race_type = detect_race_type(pdf_file)
-            out_path = os.path.join(out_dir, f"{race_type}.json")
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"JSON guardado: {out_path}")
+def _watchdog_handler(events):
+    """Handler de watchdog que encola los .pdf tocados (la clase base se importa
+    recién acá, con watchdog ya cargado)."""
+    from watchdog.events import FileSystemEventHandler
 
-            update_manifests(fecha_dir, race_type)
+    class _WatchdogHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # abrir/leer el PDF (lo hacemos nosotros al procesarlo) también genera eventos
+            if event.is_directory or event.event_type not in ("created", "modified", "moved", "closed"):
+                return
+            for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                if path and str(path).lower().endswith(".pdf"):
+                    events.put(os.fsdecode(path))
 
-if __name__ == "__main__":
-    # 1) Procesar PDFs y actualizar manifest de forma incremental
-    process_pdfs()
-    # 2) Reconstruir/limpiar manifiestos para reflejar deletions/moves
-    rebuild_manifests_from_disk()
-    # 3) Intentar subir si tenés el helper local
+    return _WatchdogHandler()
+
+def watch_pdfs(interval=1.0, debounce=2.0, use_cache=True, publish=None, columnar=False):
+    """Loop del modo --watch. Corta con Ctrl+C."""
+    if not os.path.exists(PDF_DIR):
+        print(f"Error: No existe {PDF_DIR}")
+        return
+    # La foto de firmas (y el observer) van antes de ponerse al día: un PDF que
+    # llega o termina de escribirse durante sync_pdfs se ve como cambio después.
+    watcher = PdfWatcher(interval=interval, debounce=debounce).start()
+    try:
+        # Ponerse al día con lo que pasó mientras no corría (incluye PDFs borrados)
+        writer = OutputWriter()
+        if sync_pdfs(use_cache=use_cache, writer=writer, columnar=columnar):
+            rebuild_outputs(writer, from_disk=False)
+            if publish and writer.changed:
+                publish(writer.changed)
+        journal = escaneo.Journal.load(escaneo.JOURNAL_FILE, journal_settings(columnar))
+        report = RunReport()
+        print(f"[WATCH] Vigilando {PDF_DIR} ({watcher.mode}, debounce {debounce:g}s). Ctrl+C para salir.")
+        while True:
+            for pdf_path in watcher.poll():
+                t0 = time.perf_counter()
+                try:
+                    race = process_one(pdf_path, use_cache=use_cache, publish=publish, columnar=columnar,
+                                       report=report, journal=journal)
+                except Exception as e:   # un PDF roto o trabado no puede voltear el modo watch
+                    print(f"[WATCH] Error procesando {pdf_path}: {type(e).__name__}: {e}")
+                    watcher.delivered.pop(pdf_path, None)   # se reintenta con el próximo cambio
+                    continue
+                print(f"[WATCH] {pdf_path} -> {race or 'sin datos'} ({time.perf_counter() - t0:.2f}s)")
+    except KeyboardInterrupt:
+        print("[WATCH] Fin.")
+    finally:
+        watcher.stop()
+
+def _publish_with_subir_jsons(changed_paths):
+    """Sube lo que cambió en esta corrida (y, aunque no haya cambios, los commits
+    que quedaron sin subir de una corrida anterior). True si quedó todo arriba."""
     try:
         import subir_jsons
-        subir_jsons.subir_jsons()
+        return subir_jsons.subir_jsons(list(changed_paths))
     except Exception as e:
         print(f"Aviso: no pude ejecutar subir_jsons aquí ({e}).")
+        return False
+
+# === CLI ===
+STANDINGS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfs", "Posiciones", "parse_posiciones.py")
+COMMANDS = ("extract", "rebuild-manifests", "publish", "standings", "worker")
+
+def cmd_extract(args):
+    """Procesa los PDFs (o los vigila con --watch), rearma manifiestos, índices y
+    bundles, y sube lo que cambió."""
+    global WORKER
+    # Por entorno para que también lo vean los procesos del pool (--jobs)
+    if args.ocr_workers:
+        os.environ["TIEMPOS_OCR_WORKERS"] = str(args.ocr_workers)
+        extractores.OCR_WORKERS = args.ocr_workers
+    if args.ocr_adaptive:
+        os.environ["TIEMPOS_OCR_ADAPTIVE"] = "1"
+        extractores.OCR_ADAPTIVE_DPI = True
+    if args.pymupdf_first:
+        os.environ["TIEMPOS_PYMUPDF_FIRST"] = "1"
+        extractores.PYMUPDF_FIRST = True
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.worker:
+        import servidor_pdf
+        WORKER = servidor_pdf.WorkerClient.connect(args.worker)
+        if WORKER is None:
+            print(f"[WORKER] No hay servidor de extracción en {args.worker}; extraigo en este proceso.")
+        else:
+            print(f"[WORKER] Extrayendo en el servidor {args.worker} (pid {WORKER.ping()['pid']}).")
+            if jobs > 1:
+                print(f"[WORKER] Aviso: el servidor extrae de a un PDF por vez; se ignora --jobs {args.jobs}.")
+
+    if args.watch:
+        publicador = None
+        if not args.no_publish:
+            try:
+                import subir_jsons
+                publicador = subir_jsons.Publicador(window=args.publish_window).start()
+            except Exception as e:
+                print(f"Aviso: no pude iniciar subir_jsons ({e}); sigo sin subir.")
+        try:
+            watch_pdfs(interval=args.interval, debounce=args.debounce, use_cache=not args.no_cache,
+                       publish=publicador.enqueue if publicador else None, columnar=args.columnar)
+        finally:
+            if publicador:
+                publicador.stop()
+        return 0
+
+    # 1) Procesar los PDFs nuevos o modificados según el diario (todos con --full/--force)
+    #    (con --full los manifiestos no se escriben acá: el paso 2 los deja iguales al disco)
+    writer = OutputWriter()
+    full = args.full or args.force
+    if sync_pdfs(use_cache=not args.no_cache, force=args.force, jobs=jobs, writer=writer,
+                 columnar=args.columnar, full=full) is None:
+        return 1   # sin pdfs/: no se rearma ni se sube nada
+    # 2-4) Manifiestos, índices y bundles
+    rebuild_outputs(writer, force=args.rebuild_bundles, from_disk=full)
+    # 5) Subir lo que cambió; si falla, errorlevel 1 para que el .bat lo muestre
+    if not args.no_publish and not _publish_with_subir_jsons(writer.changed):
+        print("[ERROR] No se pudieron subir los cambios a GitHub.")
+        return 1
+    return 0
+
+def rebuild_outputs(writer, force=False, from_disk=True):
+    # 2) Reconstruir/limpiar manifiestos para reflejar deletions/moves
+    #    (sin from_disk ya los actualizó sync_pdfs a partir del diario)
+    if from_disk:
+        rebuild_manifests_from_disk(writer=writer)
+    # 3) Índices por piloto/número (sólo las carreras que cambiaron)
+    build_driver_index(writer, force=force)
+    # 3b) Posiciones provisorias del campeonato (desde pilotos.json)
+    build_standings(writer, force=force)
+    # 4) Bundles por fecha y de temporada (sólo lo que cambió)
+    build_bundles(writer, force=force)
+    print(f"[RESUMEN] resultados/: {writer.summary()}")
+
+def cmd_rebuild_manifests(args):
+    """Manifiestos, índices y bundles desde los JSON de resultados/, sin abrir PDFs."""
+    rebuild_outputs(OutputWriter(), force=args.rebuild_bundles)
+    return 0
+
+def cmd_publish(args):
+    """Sube lo que git ve cambiado en resultados/."""
+    import subir_jsons
+    return 0 if subir_jsons.subir_jsons() else 1
+
+def cmd_standings(args):
+    """Corre pdfs/Posiciones/parse_posiciones.py con los argumentos que siguen."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("parse_posiciones", STANDINGS_SCRIPT)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.argv = [STANDINGS_SCRIPT] + args.args
+    return mod.main() or 0
+
+def cmd_worker(args):
+    """Deja corriendo el servidor de extracción (servidor_pdf.py)."""
+    import servidor_pdf
+    if args.new_key:
+        return servidor_pdf.new_key()
+    return servidor_pdf.serve(args.address)
+
+def build_parser():
+    ap = argparse.ArgumentParser(
+        description="Procesa los PDFs de tiempos y genera los JSON de resultados. "
+                    "Sin subcomando corre 'extract'.")
+    ap.add_argument("--startup-time", action="store_true",
+                    help="Mostrar cuánto tardó el arranque (imports + argumentos)")
+    sub = ap.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+
+    ex = sub.add_parser("extract", help="Procesar PDFs y generar resultados/ (default)")
+    ex.add_argument("--force", action="store_true", help="Re-extrae todos los PDFs ignorando la caché (y la actualiza)")
+    ex.add_argument("--no-cache", action="store_true", help="No lee ni escribe la caché de extracción")
+    ex.add_argument("--full", action="store_true",
+                    help="Procesar todos los PDFs y rearmar manifiestos desde el disco, "
+                         f"no sólo lo que cambió según el diario ({escaneo.JOURNAL_FILE})")
+    ex.add_argument("--jobs", "-j", type=int, default=1,
+                    help="Procesos en paralelo para extraer PDFs (0 = todos los núcleos)")
+    ex.add_argument("--ocr-workers", type=int, default=None,
+                    help="Páginas en OCR simultáneas por proceso (default: min(4, núcleos))")
+    ex.add_argument("--ocr-adaptive", action="store_true",
+                    help=f"OCR primero a {extractores.OCR_LOW_DPI} DPI y repite a {extractores.OCR_DPI} "
+                         "sólo si sale pobre")
+    ex.add_argument("--rebuild-bundles", action="store_true",
+                    help="Rearma bundles (bundle.json, temporada.json) e índices de pilotos/números desde cero")
+    ex.add_argument("--pymupdf-first", action="store_true",
+                    help="Probar PyMuPDF antes que pdfplumber (más rápido; puede cambiar coordenadas)")
+    ex.add_argument("--columnar", action="store_true",
+                    help="Además de <race>.json, escribe <race>.cols.json (un array por campo)")
+    ex.add_argument("--watch", action="store_true",
+                    help="Queda corriendo y procesa cada PDF nuevo o modificado apenas termina de escribirse")
+    ex.add_argument("--interval", type=float, default=1.0, help="(--watch) segundos entre chequeos")
+    ex.add_argument("--debounce", type=float, default=2.0,
+                    help="(--watch) segundos que un PDF tiene que quedar quieto antes de procesarlo")
+    ex.add_argument("--worker", nargs="?", const=os.environ.get("TIEMPOS_WORKER", "127.0.0.1:47291"),
+                    default=None, metavar="HOST:PUERTO",
+                    help="Extraer en el servidor de extracción ('worker') si está corriendo")
+    ex.add_argument("--no-publish", action="store_true", help="No ejecutar la subida (subir_jsons)")
+    ex.add_argument("--publish-window", type=float, default=5.0,
+                    help="(--watch) segundos para juntar cambios seguidos en un solo commit")
+    ex.set_defaults(func=cmd_extract)
+
+    rb = sub.add_parser("rebuild-manifests",
+                        help="Rearmar fechas.json/index.json, índices y bundles sin abrir PDFs")
+    rb.add_argument("--rebuild-bundles", action="store_true",
+                    help="Rearma bundles e índices de pilotos/números desde cero")
+    rb.set_defaults(func=cmd_rebuild_manifests)
+
+    pb = sub.add_parser("publish", help="Subir a GitHub lo que cambió en resultados/")
+    pb.set_defaults(func=cmd_publish)
+
+    st = sub.add_parser("standings", help="Parsear la planilla de posiciones (parse_posiciones.py)",
+                        description="Todo lo que sigue a 'standings' pasa tal cual a parse_posiciones.py.")
+    st.set_defaults(func=cmd_standings, args=[])
+
+    wk = sub.add_parser("worker", help="Servidor de extracción con las librerías de PDF ya cargadas")
+    wk.add_argument("--address", default=None, metavar="HOST:PUERTO",
+                    help="Dónde escuchar (default: TIEMPOS_WORKER o 127.0.0.1:47291)")
+    wk.add_argument("--new-key", action="store_true",
+                    help="Generar la clave compartida en ~/.tiempos_worker_key y salir")
+    wk.set_defaults(func=cmd_worker)
+    return ap
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # compatibilidad: "process_pdfs.py --force" == "process_pdfs.py extract --force"
+    first = next((a for a in argv if a != "--startup-time"), None)
+    if first not in COMMANDS and first not in ("-h", "--help"):
+        argv.insert(argv.index(first) if first else len(argv), "extract")
+    # lo de "standings" no pasa por argparse (REMAINDER no toma "--batch ..." de primero)
+    rest = []
+    if first == "standings":
+        cut = argv.index(first) + 1
+        argv, rest = argv[:cut], argv[cut:]
+    args = build_parser().parse_args(argv)
+    if first == "standings":
+        args.args = rest
+    if args.startup_time:
+        print(f"[INICIO] {args.command}: listo en {(time.perf_counter() - _T_START) * 1000:.0f} ms")
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# coding: utf-8
+# Servidor de extracción: un proceso que queda corriendo con las librerías de PDF
+# ya cargadas (PyMuPDF, pdfplumber, numpy, tesseract) y atiende pedidos por un
+# socket local (multiprocessing.connection). Así cada corrida del .bat o cada
+# serie que llega en modo --watch no paga el arranque de Python y los imports.
+#
+# Uso (desde la raíz del repo, que es donde quedan .cache_pdfs y resultados/):
+#   python process_pdfs.py worker                 # deja el servidor corriendo
+#   python process_pdfs.py --worker               # extrae usando el servidor
+#   python process_pdfs.py standings FECHA10.pdf --worker
+#
+# Si el servidor no está, los clientes extraen en su propio proceso como siempre.
+#
+# Los pedidos viajan con pickle, así que quien se conecte puede ejecutar código
+# como el usuario del servidor: la clave compartida es obligatoria. Sale de
+# TIEMPOS_WORKER_KEY o del archivo ~/.tiempos_worker_key (sólo legible por el
+# usuario), que se crea una vez con:
+#   python process_pdfs.py worker --new-key
+import os, secrets, sys, threading, time, traceback
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import process_pdfs as pp
+import extractores
+
+ADDRESS = os.environ.get("TIEMPOS_WORKER", "127.0.0.1:47291")
+KEY_FILE = os.environ.get("TIEMPOS_WORKER_KEY_FILE", os.path.join(os.path.expanduser("~"), ".tiempos_worker_key"))
+MIN_KEY_LEN = 16
+
+def load_authkey():
+    """La clave compartida (TIEMPOS_WORKER_KEY o KEY_FILE), o None si no hay
+    ninguna o es demasiado corta."""
+    key = os.environ.get("TIEMPOS_WORKER_KEY", "").encode()
+    if not key:
+        try:
+            with open(KEY_FILE, "rb") as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+    return key if len(key) >= MIN_KEY_LEN else None
+
+def create_key_file(path=None):
+    """Genera una clave al azar en KEY_FILE (modo 600). No pisa una existente."""
+    path = path or KEY_FILE
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(secrets.token_hex(32) + "\n")
+    return path
+
+def parse_address(address):
+    """"host:puerto" -> (host, puerto). Sólo escucha en la máquina local por defecto."""
+    host, _, port = (address or ADDRESS).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+class WorkerError(RuntimeError):
+    """El servidor atendió el pedido pero falló (el traceback viene en el mensaje)."""
+
+class ExtractionServer:
+    """Atiende pedidos {"op": ..., ...} y responde {"ok": True, "result": ...} o
+    {"ok": False, "error": ...}. Cada conexión tiene su hilo, pero los trabajos
+    corren de a uno (PyMuPDF no es thread-safe; el OCR ya reparte las páginas en
+    su propio pool)."""
+
+    def __init__(self, address=None, authkey=None):
+        self.address = parse_address(address)
+        self.authkey = authkey or load_authkey()
+        if not self.authkey:
+            raise WorkerError(f"falta la clave del servidor: definí TIEMPOS_WORKER_KEY (al menos {MIN_KEY_LEN} "
+                              f"caracteres) o creá {KEY_FILE} con 'python process_pdfs.py worker --new-key'")
+        self.lock = threading.Lock()
+        self.jobs = 0
+        self.started = time.time()
+        self._listener = None
+        self._standings = None
+        self._stopping = False
+
+    def warm(self):
+        """Importa los backends una vez, antes del primer pedido."""
+        t0 = time.perf_counter()
+        backends = {name: bool(getattr(extractores, name))
+                    for name in ("fitz", "pdfplumber", "np", "pytesseract", "tesserocr")}
+        self.standings_module()
+        print(f"[WORKER] backends listos en {(time.perf_counter() - t0) * 1000:.0f} ms: "
+              + ", ".join(k for k, ok in backends.items() if ok))
+        return backends
+
+    def standings_module(self):
+        if self._standings is None:
+            import importlib.util
+            spec = importlib.util.spec_from_file_location("parse_posiciones", pp.STANDINGS_SCRIPT)
+            self._standings = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._standings)
+        return self._standings
+
+    # --- pedidos ---
+    def op_ping(self):
+        return {"pid": os.getpid(), "jobs": self.jobs, "uptime_s": round(time.time() - self.started, 1),
+                "cwd": os.getcwd()}
+
+    def op_process(self, path, use_cache=True, force=False, name=None, settings=None):
+        """El PdfResult completo de process_pdf (tokens, filas, telemetría), con las
+        opciones de extracción del cliente (extractores.extraction_settings())."""
+        with extractores.using_settings(settings):
+            return pp.process_pdf(path, use_cache=use_cache, force=force, name=name)
+
+    def op_tokens(self, path, settings=None):
+        tel = extractores.Telemetry()
+        with extractores.using_settings(settings):
+            toks, extractor = extractores.get_tokens(path, tel)
+        return {"tokens": toks.to_columns(), "extractor": extractor, "telemetry": tel.to_dict()}
+
+    def op_standings(self, path, cache_dir=None):
+        """posiciones.json de una planilla de posiciones (parse_posiciones)."""
+        mod = self.standings_module()
+        data, _ = mod.parse_pdf(path, cache_dir)
+        return data
+
+    def op_text(self, path, cache_dir=None):
+        return "".join(self.standings_module().iter_text_lines(path, cache_dir))
+
+    def handle(self, request):
+        op = getattr(self, "op_" + str(request.pop("op", "")), None)
+        if op is None:
+            return {"ok": False, "error": "operación desconocida"}
+        try:
+            with self.lock:
+                self.jobs += 1
+                return {"ok": True, "result": op(**request)}
+        except Exception:
+            return {"ok": False, "error": traceback.format_exc()}
+
+    def _serve_conn(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if request.get("op") == "stop":
+                    conn.send({"ok": True, "result": None})
+                    self._stopping = True
+                    try:  # despertar al accept() del hilo principal
+                        Client(self.address, authkey=self.authkey).close()
+                    except OSError:
+                        pass
+                    return
+                conn.send(self.handle(dict(request)))
+
+    def serve_forever(self):
+        self.warm()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"[WORKER] Escuchando en {self.address[0]}:{self.address[1]} (pid {os.getpid()}). Ctrl+C para salir.")
+        try:
+            while not self._stopping:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break  # listener cerrado por stop()
+                except Exception as e:  # clave equivocada, cliente que se cortó, ...
+                    print(f"[WORKER] Conexión rechazada: {e}")
+                    continue
+                if self._stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+        print(f"[WORKER] Fin ({self.jobs} trabajos).")
+
+    def stop(self):
+        self._stopping = True
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+
+class WorkerClient:
+    """Conexión a un ExtractionServer. connect() devuelve None si no hay
+    servidor escuchando, así el que llama sigue en su propio proceso."""
+
+    def __init__(self, conn, address):
+        self.conn = conn
+        self.address = address
+
+    @classmethod
+    def connect(cls, address=None, authkey=None):
+        authkey = authkey or load_authkey()
+        if not authkey:
+            print(f"[WORKER] Sin clave (TIEMPOS_WORKER_KEY o {KEY_FILE}): no uso el servidor.")
+            return None
+        addr = parse_address(address)
+        try:
+            return cls(Client(addr, authkey=authkey), addr)
+        except (OSError, EOFError):
+            return None
+        except AuthenticationError:
+            print(f"[WORKER] El servidor en {addr[0]}:{addr[1]} rechazó la clave.")
+            return None
+
+    def call(self, op, **kwargs):
+        """Manda el pedido y espera la respuesta. Si se cae la conexión, OSError/EOFError."""
+        self.conn.send({"op": op, **kwargs})
+        reply = self.conn.recv()
+        if not reply.get("ok"):
+            raise WorkerError(reply.get("error"))
+        return reply["result"]
+
+    def ping(self):
+        return self.call("ping")
+
+    def process_pdf(self, pdf_path, use_cache=True, force=False):
+        # rutas absolutas: el servidor puede haber arrancado en otra carpeta
+        return self.call("process", path=os.path.abspath(pdf_path), use_cache=use_cache,
+                         force=force, name=pdf_path, settings=extractores.extraction_settings())
+
+    def tokens(self, pdf_path):
+        """(TokenTable, extractor, telemetría como dict)."""
+        out = self.call("tokens", path=os.path.abspath(pdf_path), settings=extractores.extraction_settings())
+        return extractores.TokenTable.from_columns(out["tokens"]), out["extractor"], out["telemetry"]
+
+    def standings(self, pdf_path, cache_dir=None):
+        return self.call("standings", path=os.path.abspath(pdf_path),
+                         cache_dir=os.path.abspath(cache_dir) if cache_dir else None)
+
+    def stop_server(self):
+        return self.call("stop")
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+def new_key():
+    try:
+        path = create_key_file()
+    except FileExistsError:
+        print(f"[WORKER] Ya existe {KEY_FILE}; borralo primero si querés otra clave.")
+        return 1
+    print(f"[WORKER] Clave nueva en {path}")
+    return 0
+
+def serve(address=None):
+    try:
+        server = ExtractionServer(address)
+    except WorkerError as e:
+        print(f"[WORKER] No arranco: {e}", file=sys.stderr)
+        return 2
+    server.serve_forever()
+    return 0
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--new-key"]:
+        sys.exit(new_key())
+    sys.exit(serve(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -1,43 +1,179 @@
 import os
 import subprocess
+import threading
+import time
 
 repo_dir = os.environ.get("TIEMPOS_REPO", "C:/SHOWMIDGET/TIEMPOSWEB")
+remote = os.environ.get("TIEMPOS_REMOTE", "origin")
+branch = os.environ.get("TIEMPOS_BRANCH", "main")
 
-def subir_jsons():
-    try:
-        os.chdir(repo_dir)
 
-        pull_result = subprocess.run(["git", "pull", "origin", "main"], capture_output=True, text=True)
+class Publicador:
+    """Sube a GitHub los archivos que cambiaron, de a un commit por tanda.
+
+    - enqueue(paths) encola rutas; con start() un hilo junta todo lo que llegue
+      durante `window` segundos desde la primera ruta y lo sube en un solo commit
+      (en plena noche de carreras entran varias series seguidas).
+    - Sólo se agregan las rutas recibidas (nada de `git add resultados`).
+    - Si no hay nada para commitear no hace pull ni push, salvo que haya
+      commits locales que no llegaron al remoto (un push anterior que falló).
+    - El push se reintenta con backoff exponencial, rebaseando sobre el remoto.
+    """
+
+    def __init__(self, repo=None, remote_name=None, branch_name=None, window=5.0,
+                 retries=4, backoff=2.0, message="Actualizar resultados JSON"):
+        self.repo = os.path.abspath(repo or repo_dir)
+        self.remote = remote_name or remote
+        self.branch = branch_name or branch
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.message = message
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    # --- git ---
+    def _git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo, capture_output=True, text=True)
+
+    def _relative(self, paths):
+        rel = set()
+        for p in paths:
+            r = os.path.relpath(os.path.abspath(p), self.repo)
+            if r.startswith(".."):
+                print(f"Aviso: {p} está fuera del repo {self.repo}, no se sube")
+                continue
+            rel.add(r.replace(os.sep, "/"))
+        return sorted(rel)
+
+    def _pull(self):
+        pull_result = self._git("pull", "--rebase", "--autostash", self.remote, self.branch)
         if pull_result.returncode != 0:
+            self._git("rebase", "--abort")
             print(f"Error al sincronizar con GitHub: {pull_result.stderr}")
-            return
+            return False
+        return True
 
-        status = subprocess.run(["git", "status", "--porcelain", "resultados"], capture_output=True, text=True)
-        if not status.stdout.strip():
-            print("No hay cambios en 'resultados' para subir")
-            return
-
-        add_result = subprocess.run(["git", "add", "resultados"], capture_output=True, text=True)
-        if add_result.returncode != 0:
-            print(f"Error al añadir archivos: {add_result.stderr}")
-            return
-
-        commit_result = subprocess.run(
-            ["git", "commit", "-m", "Actualizar resultados JSON"],
-            capture_output=True,
-            text=True
-        )
-        if commit_result.returncode != 0 and "nothing to commit" not in commit_result.stdout.lower():
-            print(f"Error al hacer commit: {commit_result.stderr}")
-            return
-
-        push_result = subprocess.run(["git", "push", "origin", "main"], capture_output=True, text=True)
-        if push_result.returncode == 0:
-            print("JSONs subidos exitosamente")
+    def _ahead(self):
+        """Commits de HEAD que no están en remote/branch (según la última vez que
+        se sincronizó). 0 si no se puede saber (sin remoto o sin esa rama)."""
+        count = self._git("rev-list", "--count", f"{self.remote}/{self.branch}..HEAD")
+        if count.returncode != 0:
+            return 0
+        return int(count.stdout.strip() or 0)
+
+    def publish(self, paths):
+        """Commit + push de esas rutas ahora mismo. True si quedó todo arriba."""
+        rel = self._relative(paths)
+        if not rel and not self._ahead():
+            return True
+
+        present = [p for p in rel if os.path.exists(os.path.join(self.repo, p))]
+        missing = [p for p in rel if p not in present]
+        if present:
+            add_result = self._git("add", "-A", "--", *present)
+            if add_result.returncode != 0:
+                print(f"Error al añadir archivos: {add_result.stderr}")
+                return False
+        if missing:
+            self._git("rm", "-q", "--cached", "--ignore-unmatch", "--", *missing)
+
+        staged = self._git("diff", "--cached", "--name-only", "-z", "--", *rel).stdout.split("\0") if rel else []
+        staged = [p for p in staged if p]
+        if staged:
+            commit_result = self._git("commit", "-m", self.message, "--", *staged)
+            if commit_result.returncode != 0 and "nothing to commit" not in commit_result.stdout.lower():
+                print(f"Error al hacer commit: {commit_result.stderr}")
+                return False
         else:
+            ahead = self._ahead()
+            if not ahead:
+                print("No hay cambios en 'resultados' para subir")
+                return True
+            # un push anterior falló después del commit: subirlo ahora
+            print(f"Hay {ahead} commit(s) locales sin subir a {self.remote}/{self.branch}")
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                wait = self.backoff * (2 ** (attempt - 1))
+                print(f"Reintentando push en {wait:g}s ({attempt}/{self.retries})...")
+                time.sleep(wait)
+            if not self._pull():
+                continue
+            push_result = self._git("push", self.remote, f"HEAD:{self.branch}")
+            if push_result.returncode == 0:
+                print(f"JSONs subidos exitosamente ({len(staged)} archivos)" if staged
+                      else "Commits pendientes subidos exitosamente")
+                return True
             print(f"Error al empujar a GitHub: {push_result.stderr}")
+        return False
+
+    # --- cola ---
+    def enqueue(self, paths):
+        with self._cond:
+            self._pending.update(os.path.abspath(p) for p in paths)
+            self._cond.notify()
+
+    def flush(self):
+        with self._cond:
+            paths, self._pending = self._pending, set()
+        return self.publish(paths) if paths else True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending and self._stopping:
+                    return
+                # juntar lo que llegue durante la ventana
+                deadline = time.monotonic() + self.window
+                while not self._stopping and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error inesperado: {e}")
+
+    def start(self):
+        if not self._thread:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="publicador", daemon=True)
+            self._thread.start()
+        return self
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error al ejecutar git: {e}\nDetalles: {e.stderr}")
+    def stop(self):
+        """Sube lo pendiente y termina el hilo."""
+        if self._thread:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
+
+
+def subir_jsons(paths=None):
+    """Sube los archivos indicados; sin paths, los que git ve cambiados en 'resultados'."""
+    try:
+        pub = Publicador()
+        if paths is None:
+            status = pub._git("status", "--porcelain", "-z", "--untracked-files=all", "resultados")
+            entries = iter(status.stdout.split("\0"))
+            paths = []
+            for e in entries:
+                if len(e) <= 3:
+                    continue
+                paths.append(os.path.join(pub.repo, e[3:]))
+                if e[0] in "RC":   # renombre/copia: el siguiente campo es la ruta vieja
+                    paths.append(os.path.join(pub.repo, next(entries, "")))
+        if not paths and not pub._ahead():
+            print("No hay cambios en 'resultados' para subir")
+            return True
+        return pub.publish(paths)
     except Exception as e:
         print(f"Error inesperado: {e}")
+        return False
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Prueba de subir_jsons.Publicador contra un remoto de mentira: arma en un
+# directorio temporal un repo bare (el "GitHub") y un clon con resultados/,
+# y revisa que varias tandas encoladas salgan en un solo commit, que una ruta
+# borrada se saque del índice (git rm --cached) y que, si el remoto rechaza el
+# push, el commit quede pendiente y se suba en el próximo intento.
+# No usa red ni toca el repo real; sólo necesita git.
+#
+# Uso (desde la raíz del repo):
+#   python tests/test_publicador.py
+#   python -m pytest -q tests/test_publicador.py
+#
+import os, shutil, stat, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import subir_jsons
+
+# pre-receive del remoto: rechaza mientras exista el archivo RECHAZAR (y si
+# existe RECHAZAR_UNA, rechaza sólo ese push y lo borra)
+HOOK = """#!/bin/sh
+if [ -f RECHAZAR_UNA ]; then rm -f RECHAZAR_UNA; echo "rechazado (una vez)" >&2; exit 1; fi
+if [ -f RECHAZAR ]; then echo "rechazado" >&2; exit 1; fi
+exit 0
+"""
+
+def git(cwd, *args):
+    out = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    assert out.returncode == 0, f"git {' '.join(args)}: {out.stderr}"
+    return out.stdout
+
+class Remoto:
+    """Repo bare + clon de trabajo en un tempdir."""
+
+    def __init__(self):
+        self.tmp = tempfile.mkdtemp(prefix="publicador_")
+        self.bare = os.path.join(self.tmp, "remoto.git")
+        self.clone = os.path.join(self.tmp, "clon")
+        git(self.tmp, "init", "-q", "--bare", self.bare)
+        git(self.bare, "symbolic-ref", "HEAD", "refs/heads/main")
+        hook = os.path.join(self.bare, "hooks", "pre-receive")
+        with open(hook, "w", newline="\n") as f:
+            f.write(HOOK)
+        os.chmod(hook, os.stat(hook).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        git(self.tmp, "clone", "-q", self.bare, self.clone)
+        git(self.clone, "config", "user.name", "prueba")
+        git(self.clone, "config", "user.email", "prueba@example.com")
+        git(self.clone, "checkout", "-q", "-b", "main")
+        self.write("resultados/fechas.json", '{"fechas": []}\n')
+        git(self.clone, "add", "-A")
+        git(self.clone, "commit", "-q", "-m", "inicial")
+        git(self.clone, "push", "-q", "origin", "main")
+
+    def path(self, rel):
+        return os.path.join(self.clone, *rel.split("/"))
+
+    def write(self, rel, text):
+        path = self.path(rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        return path
+
+    def publicador(self, **kw):
+        kw.setdefault("backoff", 0.0)
+        return subir_jsons.Publicador(repo=self.clone, remote_name="origin", branch_name="main", **kw)
+
+    def remote_commits(self):
+        return int(git(self.bare, "rev-list", "--count", "main").strip())
+
+    def remote_files(self):
+        return set(git(self.bare, "ls-tree", "-r", "-z", "--name-only", "main").split("\0")) - {""}
+
+    def reject(self, once=False):
+        open(os.path.join(self.bare, "RECHAZAR_UNA" if once else "RECHAZAR"), "w").close()
+
+    def accept(self):
+        for name in ("RECHAZAR", "RECHAZAR_UNA"):
+            try:
+                os.remove(os.path.join(self.bare, name))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+def con_remoto(test):
+    def run():
+        r = Remoto()
+        try:
+            test(r)
+        finally:
+            r.close()
+    run.__name__ = test.__name__
+    return run
+
+@con_remoto
+def test_junta_tandas_en_un_commit(r):
+    pub = r.publicador(window=0.5).start()
+    pub.enqueue([r.write("resultados/Fecha 01/serie1.json", '{"a": 1}\n')])
+    pub.enqueue([r.write("resultados/Fecha 01/serie2.json", '{"b": 2}\n'),
+                 r.write("resultados/Fecha 01/index.json", '{"races": ["serie1", "serie2"]}\n')])
+    pub.enqueue([r.path("resultados/Fecha 01/serie1.json")])   # repetida: una sola vez
+    pub.stop()
+    assert r.remote_commits() == 2, "las tres tandas tenían que salir en un solo commit"
+    assert {"resultados/Fecha 01/serie1.json", "resultados/Fecha 01/serie2.json",
+            "resultados/Fecha 01/index.json"} <= r.remote_files()
+    assert git(r.clone, "status", "--porcelain") == ""
+
+@con_remoto
+def test_ruta_borrada_sale_del_indice(r):
+    pub = r.publicador()
+    path = r.write("resultados/Fecha 02/final.json", '{"c": 3}\n')
+    assert pub.publish([path])
+    assert "resultados/Fecha 02/final.json" in r.remote_files()
+    os.remove(path)
+    assert pub.publish([path])
+    assert "resultados/Fecha 02/final.json" not in r.remote_files()
+    assert r.remote_commits() == 3
+    assert git(r.clone, "status", "--porcelain") == ""
+
+@con_remoto
+def test_push_rechazado_queda_pendiente(r):
+    pub = r.publicador(retries=1)
+    r.reject()
+    path = r.write("resultados/Fecha 03/serie1.json", '{"d": 4}\n')
+    assert not pub.publish([path]), "con el remoto rechazando, publish tenía que fallar"
+    assert r.remote_commits() == 1
+    assert pub._ahead() == 1, "el commit local tenía que quedar sin subir"
+
+    # sin rutas nuevas: igual sube el commit que quedó pendiente
+    r.accept()
+    assert pub.publish([])
+    assert r.remote_commits() == 2 and pub._ahead() == 0
+    assert "resultados/Fecha 03/serie1.json" in r.remote_files()
+
+@con_remoto
+def test_reintento_despues_de_rechazo(r):
+    pub = r.publicador(retries=2)
+    r.reject(once=True)
+    assert pub.publish([r.write("resultados/Fecha 04/serie1.json", '{"e": 5}\n')])
+    assert r.remote_commits() == 2 and pub._ahead() == 0
+
+TESTS = [test_junta_tandas_en_un_commit, test_ruta_borrada_sale_del_indice,
+         test_push_rechazado_queda_pendiente, test_reintento_despues_de_rechazo]
+
+def main():
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"[OK]    {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"[FALLA] {test.__name__}: {e}")
+    print(f"{len(TESTS) - failed}/{len(TESTS)} pruebas OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())